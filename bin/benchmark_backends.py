@@ -0,0 +1,61 @@
+""" Benchmark of the execution backends of the events handlers.
+
+Synthetic packets are put in the queue of an ON/OFF events counter run
+with each backend, and the time until all of them are counted is
+measured. The counter is a lightweight handler, so the measured time is
+mostly the overhead of passing the packets to the handler.
+
+Run according to the following example:
+
+python bin/benchmark_backends.py --packets 2000 --packet-size 4096
+"""
+
+import argparse
+import time
+
+from pycaer.process.camera_events_handler import BACKENDS
+from pycaer.process.on_off_events_counter import OnOffEventsCounter
+from pycaer.process.synthetic_events import moving_edge, split_to_packets
+
+
+def run_backend(backend, packets, number_of_events):
+    counter = OnOffEventsCounter(backend=backend)
+    counter.start()
+
+    events_queue = counter.get_events_queue()
+
+    start_time = time.time()
+    for packet in packets:
+        events_queue.put_nowait(packet)
+
+    while sum(counter.get_events_count()) < number_of_events:
+        time.sleep(0.0001)
+    elapsed_time = time.time() - start_time
+
+    counter.stop()
+    counter.join()
+    events_queue.close()
+
+    return elapsed_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=2000)
+    parser.add_argument('--packet-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    # NOTE: The synthetic events are all valid, so every event is counted
+    duration = 1.0
+    events = moving_edge(duration, args.packets * args.packet_size / duration, 500)
+    packets = split_to_packets(events, args.packet_size)
+
+    print 'Packets: {0} of {1} events'.format(len(packets), args.packet_size)
+    for backend in BACKENDS:
+        elapsed_time = run_backend(backend, packets, len(events))
+        print '{0:8} {1:8.1f} us/packet {2:12.0f} events/s'.format(
+            backend, elapsed_time * 1e6 / len(packets), len(events) / elapsed_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+""" Benchmark of the cluster tracker on synthetic moving blobs.
+
+The tracker is created with the inline backend and fed stamped packets
+through its events queue, the way the Demux module feeds it. The tracked
+clusters are then compared with the true positions of the blobs.
+
+Run according to the following example:
+
+python bin/benchmark_cluster_tracker.py --rate 1000000 --blobs 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pycaer.process.camera_events_handler import INLINE_BACKEND
+from pycaer.process.cluster_tracker import ClusterTracker, CLUSTER_X, CLUSTER_Y, \
+                                           CLUSTER_VX, CLUSTER_VY
+from pycaer.process.synthetic_events import moving_blobs, split_to_packets, put_packets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds of synthetic data')
+    parser.add_argument('--rate', type=float, default=1e6, help='events per second')
+    parser.add_argument('--blobs', type=int, default=4)
+    parser.add_argument('--speed', type=float, default=100, help='blob speed in pixels per second')
+    parser.add_argument('--packet-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    random = np.random.RandomState(1)
+    angles = random.uniform(0, 2 * np.pi, args.blobs)
+    blobs = np.column_stack((random.uniform(16, 112, (args.blobs, 2)),
+                             args.speed * np.cos(angles),
+                             args.speed * np.sin(angles)))
+
+    events, get_centers = moving_blobs(args.duration, args.rate, blobs)
+    packets = split_to_packets(events, args.packet_size)
+
+    tracker = ClusterTracker(backend=INLINE_BACKEND)
+
+    start_time = time.time()
+    put_packets(tracker.get_events_queue(), packets)
+    elapsed_time = time.time() - start_time
+
+    latency = tracker.get_latency_tracker().get_statistics()
+
+    clusters = tracker.get_clusters()
+    centers = get_centers(events[-1, 1])
+
+    # Match every blob to its nearest cluster
+    differences = centers[:, np.newaxis, :] - clusters[np.newaxis, :, CLUSTER_X:CLUSTER_Y + 1]
+    distances = np.sqrt((differences ** 2).sum(axis=2))
+    nearest = distances.argmin(axis=1)
+    speeds = np.hypot(clusters[nearest, CLUSTER_VX], clusters[nearest, CLUSTER_VY])
+
+    # Clusters farther than the cluster radius from every blob track nothing
+    unmatched = (distances.min(axis=0) > tracker._radius).sum()
+
+    print 'Events:             {0}'.format(len(events))
+    print 'Processing time:    {0:.3f} s'.format(elapsed_time)
+    print 'Throughput:         {0:.0f} events/s'.format(len(events) / elapsed_time)
+    print 'Real time factor:   {0:.2f}x'.format(args.duration / elapsed_time)
+    print 'Latency:            {0:.2f} ms (p50), {1:.2f} ms (p99)'.format(
+        latency['p50'] * 1000, latency['p99'] * 1000)
+    print 'Active clusters:    {0} (blobs: {1})'.format(len(clusters), args.blobs)
+    print 'Unmatched clusters: {0}'.format(unmatched)
+    print 'Position error:     {0:.2f} px (mean)'.format(distances[np.arange(args.blobs), nearest].mean())
+    print 'Speed:              {0:.1f} px/s (mean, expected {1:.1f})'.format(speeds.mean(), args.speed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+""" Benchmark of the corner detector on a synthetic moving square.
+
+The detector runs with the inline backend, so putting a packet in its
+queue handles it at once, stamps included. The detected corners are
+compared with the true corners of the square.
+
+Run according to the following example:
+
+python bin/benchmark_corner_detector.py --rate 1000000 --speed 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pycaer.dvs128.process_packets import unpack_polarity_events
+from pycaer.process.camera_events_handler import INLINE_BACKEND
+from pycaer.process.corner_detector import CornerDetector
+from pycaer.process.latency import split_stamp
+from pycaer.process.synthetic_events import moving_square, split_to_packets, put_packets
+from pycaer.recording.batch_processing import CollectingQueue
+
+# Corners detected within this distance (in pixels) of a true corner are correct
+MAX_CORNER_DISTANCE = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds of synthetic data')
+    parser.add_argument('--rate', type=float, default=1e6, help='events per second')
+    parser.add_argument('--speed', type=float, default=200, help='square speed in pixels per second')
+    parser.add_argument('--size', type=int, default=32, help='square size in pixels')
+    parser.add_argument('--packet-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    velocity = (args.speed * np.cos(0.5), args.speed * np.sin(0.5))
+    events, get_corners = moving_square(args.duration, args.rate, velocity, args.size)
+    packets = split_to_packets(events, args.packet_size)
+
+    output_queue = CollectingQueue()
+    corner_detector = CornerDetector(output_queue, backend=INLINE_BACKEND)
+
+    start_time = time.time()
+    put_packets(corner_detector.get_events_queue(), packets)
+    elapsed_time = time.time() - start_time
+
+    latency = corner_detector.get_latency_tracker().get_statistics()
+
+    corners = np.concatenate([split_stamp(item)[1] for item in output_queue.items])
+    _, _, y, x = unpack_polarity_events(corners)
+
+    # Distance of every detected corner from the nearest true corner
+    distances = np.empty(len(corners))
+    for i, timestamp in enumerate(corners[:, 1]):
+        differences = get_corners(timestamp) - (x[i], y[i])
+        distances[i] = np.sqrt((differences ** 2).sum(axis=1)).min()
+
+    print 'Events:             {0}'.format(len(events))
+    print 'Corners:            {0}'.format(len(corners))
+    print 'Reduction:          {0:.1f}x'.format(len(events) / float(max(len(corners), 1)))
+    print 'Processing time:    {0:.3f} s'.format(elapsed_time)
+    print 'Throughput:         {0:.0f} events/s'.format(len(events) / elapsed_time)
+    print 'Real time factor:   {0:.2f}x'.format(args.duration / elapsed_time)
+    print 'Latency:            {0:.2f} ms (p50), {1:.2f} ms (p99)'.format(
+        latency['p50'] * 1000, latency['p99'] * 1000)
+    print 'Near true corners:  {0:.1f}% (within {1} px)'.format(
+        100.0 * np.mean(distances <= MAX_CORNER_DISTANCE), MAX_CORNER_DISTANCE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+""" Benchmark of the import time of the package modules.
+
+Every handler process and command line tool imports some of the modules,
+so their import time is paid by every short-lived worker. Each module is
+imported in a fresh interpreter and its import time is compared with a
+budget. Modules must also not load the heavy dependencies which only some
+features need.
+
+Exits with a non-zero status if any module is over the budget or loads
+a heavy dependency, so it may be used as a check.
+
+Run according to the following example:
+
+python bin/benchmark_import_time.py --budget 100 --repeat 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+MODULES = ['pycaer.dvs128.controller',
+           'pycaer.process.latency',
+           'pycaer.process.demux',
+           'pycaer.process.on_off_events_counter',
+           'pycaer.process.focus_filter',
+           'pycaer.process.optical_flow',
+           'pycaer.process.cluster_tracker',
+           'pycaer.process.corner_detector',
+           'pycaer.graphics.render',
+           'pycaer.network.event_stream_server',
+           'pycaer.recording.recorder',
+           'pycaer.recording.batch_processing',
+           'pycaer.recording.dataset_export']
+
+# Dependencies which should be loaded only by the features using them
+HEAVY_MODULES = ['scipy', 'pygame']
+
+# Prints the import time (in milliseconds) and the heavy modules loaded
+IMPORT_SCRIPT = '''
+import sys, time
+start_time = time.time()
+{import_statement}
+elapsed_time = time.time() - start_time
+print('{{0}};{{1}}'.format(elapsed_time * 1000, ','.join(
+    module for module in {heavy_modules!r} if module in sys.modules)))
+'''
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter. Returns the import time in
+    milliseconds and the heavy modules it loaded.
+    """
+
+    script = IMPORT_SCRIPT.format(import_statement='import {0}'.format(module),
+                                  heavy_modules=HEAVY_MODULES)
+
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [REPOSITORY_DIRECTORY,
+                                                              environment.get('PYTHONPATH')]))
+
+    output = subprocess.check_output([sys.executable, '-c', script], env=environment)
+    elapsed_time, heavy_modules = output.strip().split(';')
+
+    return float(elapsed_time), [module for module in heavy_modules.split(',') if module]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=100,
+                        help='milliseconds allowed for importing each module')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='imports per module. The fastest one is reported')
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args()
+
+    # NOTE: numpy is a dependency of nearly every module. Its import time
+    # is shown separately, and counted in the budget of the modules
+    numpy_time = min(measure_import('numpy')[0] for _ in xrange(args.repeat))
+    print '{0:40} {1:8.1f} ms'.format('numpy', numpy_time)
+
+    failed = False
+    for module in args.modules:
+        measurements = [measure_import(module) for _ in xrange(args.repeat)]
+        elapsed_time = min(elapsed_time for elapsed_time, _ in measurements)
+        heavy_modules = sorted(set(heavy_module for _, heavy_modules in measurements
+                                   for heavy_module in heavy_modules))
+
+        problems = []
+        if elapsed_time > args.budget:
+            problems.append('over budget')
+        if heavy_modules:
+            problems.append('loads {0}'.format(', '.join(heavy_modules)))
+
+        print '{0:40} {1:8.1f} ms  {2}'.format(module, elapsed_time, '; '.join(problems) or 'OK')
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+""" Benchmark of the optical flow handler on a synthetic moving edge.
+
+Packets of the size sent by the camera are put in the queue of a flow
+handler created with the inline backend. No process is started, so the
+measured time is the handling of the packets within the putting process.
+
+Run according to the following example:
+
+python bin/benchmark_optical_flow.py --rate 1000000 --speed 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pycaer.process.camera_events_handler import INLINE_BACKEND
+from pycaer.process.latency import split_stamp
+from pycaer.process.optical_flow import OpticalFlow
+from pycaer.process.synthetic_events import moving_edge, split_to_packets, put_packets
+from pycaer.recording.batch_processing import CollectingQueue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds of synthetic data')
+    parser.add_argument('--rate', type=float, default=1e6, help='events per second')
+    parser.add_argument('--speed', type=float, default=500, help='edge speed in pixels per second')
+    parser.add_argument('--packet-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    events = moving_edge(args.duration, args.rate, args.speed)
+    packets = split_to_packets(events, args.packet_size)
+
+    output_queue = CollectingQueue()
+    optical_flow = OpticalFlow(output_queue, region_size=32, backend=INLINE_BACKEND)
+
+    start_time = time.time()
+    put_packets(optical_flow.get_events_queue(), packets)
+    elapsed_time = time.time() - start_time
+
+    latency = optical_flow.get_latency_tracker().get_statistics()
+
+    measured_vx = []
+    for item in output_queue.items:
+        flow, regions = split_stamp(item)[1]
+        measured_vx.append(np.median(flow[:, 3]) if len(flow) else np.nan)
+
+    print 'Events:           {0}'.format(len(events))
+    print 'Packets:          {0}'.format(len(packets))
+    print 'Processing time:  {0:.3f} s'.format(elapsed_time)
+    print 'Throughput:       {0:.0f} events/s'.format(len(events) / elapsed_time)
+    print 'Real time factor: {0:.2f}x'.format(args.duration / elapsed_time)
+    print 'Latency:          {0:.2f} ms (p50), {1:.2f} ms (p99)'.format(
+        latency['p50'] * 1000, latency['p99'] * 1000)
+    print 'Median vx:        {0:.1f} px/s (expected {1:.1f})'.format(np.nanmedian(measured_vx),
+                                                                    args.speed)
+
+
+if __name__ == '__main__':
+    main()
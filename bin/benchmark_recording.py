@@ -0,0 +1,84 @@
+""" Benchmark of time range and ROI queries on an indexed recording.
+
+A synthetic recording is written (if it does not exist yet) and slices
+of it are read at random times, with and without a region of interest.
+The fraction of the blocks and events which the region of interest lets
+the reader skip is also shown. Since the synthetic events include noise
+spread over the whole sensor, the bounding boxes of the blocks alone
+would let it skip nothing.
+
+Run according to the following example (a one hour recording):
+
+python bin/benchmark_recording.py --duration 3600 --rate 100000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from pycaer.recording.recorder import RecordingWriter
+from pycaer.recording.recording_format import get_roi_tiles
+from pycaer.recording.recording_reader import RecordingReader
+from pycaer.dvs128.process_packets import TIMESTAMPS_PER_SECOND
+from pycaer.process.synthetic_events import moving_edge, split_to_packets
+
+
+def write_recording(path, duration, rate):
+    with RecordingWriter(path) as writer:
+        # Generate the events a second at a time to keep memory bounded
+        for second in xrange(int(duration)):
+            events = moving_edge(1, rate, speed=500, seed=second)
+            events[:, 1] += second * TIMESTAMPS_PER_SECOND
+
+            for packet in split_to_packets(events):
+                writer.write(packet)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default='benchmark_recording.caer')
+    parser.add_argument('--duration', type=float, default=600, help='seconds of synthetic data')
+    parser.add_argument('--rate', type=float, default=100000, help='events per second')
+    parser.add_argument('--slice', type=float, default=2, help='seconds per query')
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        start_time = time.time()
+        write_recording(args.path, args.duration, args.rate)
+        print 'Writing time:       {0:.1f} s'.format(time.time() - start_time)
+
+    random = np.random.RandomState(0)
+    slice_duration = int(args.slice * TIMESTAMPS_PER_SECOND)
+
+    start_time = time.time()
+    reader = RecordingReader(args.path)
+    print 'Opening time:       {0:.1f} ms'.format((time.time() - start_time) * 1000)
+    print 'Recording:          {0} events, {1} MB'.format(reader.get_number_of_events(),
+                                                         os.path.getsize(args.path) // 2 ** 20)
+
+    for roi in (None, (0, 0, 32, 32)):
+        starts = random.randint(reader.get_start_time(), reader.get_end_time() - slice_duration,
+                                args.queries)
+
+        start_time = time.time()
+        number_of_events = 0
+        for start in starts:
+            number_of_events += len(reader.read(start, start + slice_duration, roi))
+        elapsed_time = (time.time() - start_time) / args.queries
+
+        print 'Query (ROI {0}): {1:.1f} ms, {2} events per query'.format(
+            roi, elapsed_time * 1000, number_of_events // args.queries)
+
+        if roi is not None:
+            tile_counts = reader.get_index()['tile_counts'][:, get_roi_tiles(roi)]
+            print 'Skipped by the ROI: {0:.1f}% of blocks, {1:.1f}% of events'.format(
+                100.0 * np.mean(tile_counts.sum(axis=1) == 0),
+                100.0 * (1 - float(tile_counts.sum()) / reader.get_number_of_events()))
+
+    reader.close()
+
+
+if __name__ == '__main__':
+    main()
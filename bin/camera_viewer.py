@@ -1,25 +1,165 @@
 """ Module implementing a simple video renderer which presents
 the camera output on screen.
 
-TODO: Possible optimization methods:
-1) Move event processing and video rendering to the same process since moving
-   the data between processse takes a lot of time.
-2) Accumulating data and less calls to pipe send (currently done per pixel)
-3) Keep track of the events timestamps and drop those which are too much in the past
+Two modes are available:
+1) "fused" (the default): acquisition, decoding and rendering all run in
+   a single process on a frame clock. Packets are decoded into arrays and
+   drawn with array operations. When the viewer falls behind the camera,
+   older packets are dropped so the latest events are always the ones
+   drawn. A HUD shows the events rate, the dropped packets and the frame
+   time, so the viewer may be used as a live performance monitor.
+2) "pipe": events are decoded in the main process and sent through a
+   pipe to a separate rendering process.
+
+Run according to the following example:
+
+python bin/camera_viewer.py --mode fused --multiplier 4
 """
 
+import argparse
 import pygame
-from time import time
+import numpy as np
+from time import time, sleep
 
 from multiprocessing import Process, Pipe
 
 from pycaer.dvs128.controller import Controller
 from pycaer.dvs128.consts import *
+from pycaer.dvs128.packet_definitions import POLARITY_EVENT
+from pycaer.dvs128.process_packets import unpack_polarity_events, TIMESTAMPS_PER_SECOND, \
+                                         POLARITY_COLORS
 
 # NOTE: Maximum frame rate depends on many more
 # factors such as whether we are working over X or not...
 MULTIPLIER = 2
+FPS = 30
 
+FOV_WIDTH = 128
+FOV_HEIGHT = 128
+
+
+def get_polarity_events(event_packet):
+    """Decode the polarity events of a container into an (N, 3)
+    array of (polarity, x, y) rows of the valid events, and an array
+    of their timestamps.
+    """
+
+    [header, packet] = event_packet.get_event_packet(POLARITY_EVENT)
+    if header is None:
+        return None, None
+
+    events = packet.get_all_events_array()
+    valid_mark, polarity, y, x = unpack_polarity_events(events)
+
+    valid = valid_mark == 1
+
+    return np.column_stack((polarity[valid], x[valid], y[valid])), events[valid, 1]
+
+
+class HUD(object):
+    """Heads-up display of the viewer's performance."""
+
+    # Seconds between updates of the displayed rates
+    UPDATE_INTERVAL = 0.5
+
+    def __init__(self):
+        self._font = pygame.font.Font(None, 18)
+
+        self._events_count = 0
+        self._dropped_packets = 0
+        self._frame_time = 0
+
+        self._last_update_time = time()
+        self._events_per_second = 0
+
+    def add_events(self, count):
+        self._events_count += count
+
+    def add_dropped_packets(self, count):
+        self._dropped_packets += count
+
+    def set_frame_time(self, frame_time):
+        self._frame_time = frame_time
+
+    def draw(self, screen):
+        current_time = time()
+        if current_time - self._last_update_time >= self.UPDATE_INTERVAL:
+            self._events_per_second = self._events_count / (current_time - self._last_update_time)
+            self._events_count = 0
+            self._last_update_time = current_time
+
+        lines = ["{0:.0f} ev/s".format(self._events_per_second),
+                 "dropped: {0}".format(self._dropped_packets),
+                 "frame: {0:.1f} ms".format(self._frame_time * 1000)]
+
+        for i, line in enumerate(lines):
+            screen.blit(self._font.render(line, True, (255, 255, 255)), (4, 4 + i * 14))
+
+
+def run_fused(c, multiplier, fps):
+    screen = pygame.display.set_mode((FOV_WIDTH * multiplier, FOV_HEIGHT * multiplier))
+    surface = pygame.Surface((FOV_WIDTH, FOV_HEIGHT))
+    frame = np.zeros((FOV_WIDTH, FOV_HEIGHT, 3), dtype=np.uint8)
+
+    clock = pygame.time.Clock()
+    hud = HUD()
+
+    # NOTE: Non-blocking mode lets the acquisition loop keep the frame clock
+    c.set_configuration(CAER_HOST_CONFIG_DATAEXCHANGE, CAER_HOST_CONFIG_DATAEXCHANGE_BLOCKING, False)
+
+    frame_interval = 1.0 / fps
+
+    while True:
+        frame_start_time = time()
+
+        # Acquire everything available until the frame is due
+        packets = []
+        while time() - frame_start_time < frame_interval:
+            event_packet = c.get_data()
+            if event_packet is None:
+                sleep(0.0005)
+                continue
+
+            events, timestamps = get_polarity_events(event_packet)
+            if events is not None and len(events) > 0:
+                packets.append((events, timestamps))
+
+        processing_start_time = time()
+
+        frame.fill(0)
+
+        # Drop to latest: only the packets within a frame interval (in
+        # camera time) of the newest event are drawn
+        if packets:
+            newest_timestamp = packets[-1][1][-1]
+            oldest_timestamp = newest_timestamp - frame_interval * TIMESTAMPS_PER_SECOND
+
+            drawn_packets = [events for events, timestamps in packets
+                             if timestamps[-1] >= oldest_timestamp]
+
+            hud.add_events(sum(len(events) for events, _ in packets))
+            hud.add_dropped_packets(len(packets) - len(drawn_packets))
+
+            events = np.concatenate(drawn_packets)
+            polarity, x, y = events[:, 0], events[:, 1], events[:, 2]
+
+            # NOTE: Same orientation as in the "pipe" mode
+            frame[127 - x, 127 - y] = POLARITY_COLORS[polarity]
+
+        pygame.surfarray.blit_array(surface, frame)
+        pygame.transform.scale(surface, screen.get_size(), screen)
+        hud.draw(screen)
+
+        pygame.display.flip()
+
+        hud.set_frame_time(time() - processing_start_time)
+
+        clock.tick()
+        pygame.display.set_caption("FPS: {0:.2f}".format(clock.get_fps()))
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
 
 def render(screen, events_pipe):
     black = (0, 0, 0)
@@ -38,10 +178,10 @@ def render(screen, events_pipe):
         while current_time - last_frame_time < 0.034:
             updates = events_pipe.recv()
             for update in updates:
-                polarity, x, y = update 
+                polarity, x, y = update
 
                 if polarity == 0:
-                    color = (255, 0, 0)        
+                    color = (255, 0, 0)
                 else:
                     color = (0, 255, 0)
 
@@ -50,7 +190,7 @@ def render(screen, events_pipe):
                              (127 - y) * MULTIPLIER, \
                              MULTIPLIER, \
                              MULTIPLIER))
-            
+
             current_time = time()
 
         # Flush pipe to remove all events which were not draw in this frame
@@ -70,25 +210,15 @@ def render(screen, events_pipe):
         last_frame_time = current_time
 
 def handle_event_packet(event_packet, events_pipe):
-    [header, packet] = event_packet.get_event_packet(1)
-    number_of_events = header.get_number_of_events()
-
-    updates = []
-    for i in xrange(max(1, number_of_events)):
-        event = packet.get_event(i)
-        polarity = event.get_polarity()
-        x = event.get_x()
-        y = event.get_y()
-
-        updates.append((polarity, x, y))
-
-    events_pipe.send(updates)
+    events, _ = get_polarity_events(event_packet)
+    if events is None:
+        return
 
-def main():
-    pygame.init()
+    # NOTE: A single array per packet is sent, rather than a tuple per event
+    events_pipe.send(events)
 
-    size = width, height = 128 * MULTIPLIER, 128 * MULTIPLIER
-    FPS = 30
+def run_pipe(c):
+    size = width, height = FOV_WIDTH * MULTIPLIER, FOV_HEIGHT * MULTIPLIER
 
     screen = pygame.display.set_mode(size)
 
@@ -96,10 +226,6 @@ def main():
     rendering_process = Process(target=render, args=(screen, child_pipe))
     rendering_process.start()
 
-    c = Controller()
-    c.open_device()
-    c.send_default_configuration()
-    c.start_data()
     c.set_configuration(CAER_HOST_CONFIG_DATAEXCHANGE, CAER_HOST_CONFIG_DATAEXCHANGE_BLOCKING, True)
 
     while True:
@@ -107,14 +233,38 @@ def main():
             # NOTE: We are keeping the handling of the events as in real time as possible
 
             event_packet = c.get_data()
-            handle_event_packet(event_packet, parent_pipe)
+            if event_packet is not None:
+                handle_event_packet(event_packet, parent_pipe)
         except KeyboardInterrupt:
             break
 
     rendering_process.terminate()
-    
-    c.stop_data()
-    c.close_device()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['fused', 'pipe'], default='fused')
+    parser.add_argument('--multiplier', type=int, default=MULTIPLIER,
+                        help='screen pixels per camera pixel (fused mode)')
+    parser.add_argument('--fps', type=float, default=FPS, help='frame rate (fused mode)')
+    args = parser.parse_args()
+
+    pygame.init()
+
+    c = Controller()
+    c.open_device()
+    c.send_default_configuration()
+    c.start_data()
+
+    try:
+        if args.mode == 'fused':
+            run_fused(c, args.multiplier, args.fps)
+        else:
+            run_pipe(c)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        c.stop_data()
+        c.close_device()
 
 if __name__ == "__main__":
     main()
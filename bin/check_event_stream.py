@@ -0,0 +1,162 @@
+""" Check of the events stream server and client over loopback.
+
+Synthetic packets are put in the queue of an EventStreamServer process,
+with no camera involved. Three clients connect to it:
+- A client of the entire field of view.
+- A client of a region of interest with decimation.
+- A client which never reads, whose receive buffer is shrunk so the
+  kernel's loopback buffers do not absorb the stream.
+The events received by the reading clients are compared with the events
+expected by their subscriptions, and the client which does not read
+must be disconnected once its send buffer is full.
+
+Exits with a non-zero status if any check fails, so it may be used as a
+check.
+
+Run according to the following example:
+
+python bin/check_event_stream.py --packets 200 --roi 0 0 64 64 --decimation 3
+"""
+
+import argparse
+import socket
+import sys
+import time
+
+import numpy as np
+
+from pycaer.dvs128.process_packets import unpack_polarity_events
+from pycaer.network.event_stream_client import EventStreamClient
+from pycaer.network.event_stream_server import EventStreamServer
+from pycaer.network.stream_protocol import pack_subscription
+from pycaer.process.latency import StampedPacket, monotonic_time
+from pycaer.process.synthetic_events import moving_edge, split_to_packets
+
+# Seconds to wait for the server before a check fails
+TIMEOUT = 5.0
+
+
+def connect_stalled_client(address, receive_buffer_size):
+    """Connect a client which subscribes to the entire field of view and
+    never reads.
+    """
+
+    stalled_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # NOTE: Must be set before connecting, as the TCP window is agreed on
+    # when the connection is made
+    stalled_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_size)
+    stalled_socket.connect(address)
+    stalled_socket.sendall(pack_subscription())
+
+    return stalled_socket
+
+def receive_until(client, sequence):
+    """Receive batches until the batch of a given sequence number arrives.
+    Returns the received events.
+    """
+
+    batches = []
+    deadline = time.time() + TIMEOUT
+    while client.get_last_sequence() != sequence:
+        if time.time() > deadline:
+            raise RuntimeError('Batch {0} did not arrive'.format(sequence))
+
+        events = client.receive(timeout=TIMEOUT)
+        if events is not None:
+            batches.append(events)
+
+    return batches
+
+def wait_for(condition):
+    deadline = time.time() + TIMEOUT
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=200)
+    parser.add_argument('--packet-size', type=int, default=4096)
+    parser.add_argument('--roi', type=int, nargs=4, default=[0, 0, 64, 64],
+                        metavar=('X_START', 'Y_START', 'X_END', 'Y_END'))
+    parser.add_argument('--decimation', type=int, default=3)
+    parser.add_argument('--max-send-buffer-size', type=int, default=256 * 1024,
+                        help='bytes a client may fall behind before it is disconnected')
+    parser.add_argument('--receive-buffer-size', type=int, default=4096,
+                        help='receive buffer (SO_RCVBUF) of the client which never reads')
+    args = parser.parse_args()
+
+    events = moving_edge(1.0, args.packets * args.packet_size, 500)
+    packets = split_to_packets(events, args.packet_size)
+
+    server = EventStreamServer(port=0, max_send_buffer_size=args.max_send_buffer_size)
+    address = server.get_address()
+    events_queue = server.get_events_queue()
+    server.start()
+
+    stalled_socket = connect_stalled_client(address, args.receive_buffer_size)
+    full_client = EventStreamClient(*address)
+    roi_client = EventStreamClient(*address, roi=tuple(args.roi), decimation=args.decimation)
+    for client in (full_client, roi_client):
+        client.connect(TIMEOUT)
+
+    # NOTE: Empty packets are sent until both reading clients receive a
+    # batch, so no events are sent before their subscriptions are handled
+    sequence = 0
+    while full_client.get_last_sequence() is None or roi_client.get_last_sequence() is None:
+        events_queue.put_nowait(StampedPacket(sequence, monotonic_time(),
+                                              np.empty((0, 2), dtype=np.int32)))
+        for client in (full_client, roi_client):
+            client.receive(timeout=0.1)
+        sequence += 1
+
+    # Batches of an earlier sequence may still be on their way
+    for client in (full_client, roi_client):
+        receive_until(client, sequence - 1)
+
+    # NOTE: The clients receive every batch before the next packet is put,
+    # so the reading clients never fall behind
+    full_batches = []
+    roi_batches = []
+    for packet in packets:
+        events_queue.put_nowait(StampedPacket(sequence, monotonic_time(), packet))
+        full_batches += receive_until(full_client, sequence)
+        roi_batches += receive_until(roi_client, sequence)
+        sequence += 1
+
+    evicted = wait_for(lambda: server.get_number_of_evictions() == 1 and
+                       server.get_number_of_clients() == 2)
+
+    full_client.close()
+    roi_client.close()
+    stalled_socket.close()
+    server.stop()
+    server.join()
+
+    x_start, y_start, x_end, y_end = args.roi
+    _, _, y, x = unpack_polarity_events(events)
+    in_roi = (x >= x_start) & (x < x_end) & (y >= y_start) & (y < y_end)
+    expected_roi_events = events[in_roi][::args.decimation]
+
+    full_events = np.concatenate(full_batches)
+    roi_events = np.concatenate(roi_batches)
+
+    checks = [('Full field of view: {0} of {1} events'.format(len(full_events), len(events)),
+               np.array_equal(full_events, events)),
+              ('ROI {0} / {1}: {2} of {3} events'.format(tuple(args.roi), args.decimation,
+                                                          len(roi_events), len(expected_roi_events)),
+               np.array_equal(roi_events, expected_roi_events)),
+              ('Client which does not read disconnected', evicted)]
+
+    for description, passed in checks:
+        print '{0:60} {1}'.format(description, 'OK' if passed else 'FAILED')
+
+    sys.exit(0 if all(passed for _, passed in checks) else 1)
+
+
+if __name__ == '__main__':
+    main()
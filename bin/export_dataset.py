@@ -0,0 +1,44 @@
+""" Export a recording as a dataset of fixed-shape tensors.
+
+The tensors are written into memory-mapped .npy shards with an index
+file. See pycaer/recording/dataset_export.py.
+
+Run according to the following example:
+
+python bin/export_dataset.py recording.caer dataset --representation voxel --bins 5
+"""
+
+import argparse
+import time
+
+from pycaer.dvs128.process_packets import MICROSECONDS_PER_MILLISECOND
+from pycaer.recording.dataset_export import REPRESENTATIONS, export_recording
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording')
+    parser.add_argument('directory')
+    parser.add_argument('--representation', choices=REPRESENTATIONS, default='voxel')
+    parser.add_argument('--bins', type=int, default=5, help='time bins per sample')
+    parser.add_argument('--sample-duration', type=float, default=50,
+                        help='milliseconds of recording per sample')
+    parser.add_argument('--samples-per-shard', type=int, default=128)
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of processes (defaults to the number of CPUs)')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    number_of_samples = export_recording(args.recording, args.directory, args.representation,
+                                         args.bins,
+                                         int(args.sample_duration * MICROSECONDS_PER_MILLISECOND),
+                                         args.samples_per_shard, args.processes)
+    elapsed_time = time.time() - start_time
+
+    print 'Samples:          {0}'.format(number_of_samples)
+    print 'Processing time:  {0:.2f} s'.format(elapsed_time)
+    print 'Throughput:       {0:.0f} samples/s'.format(number_of_samples / elapsed_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+""" Process a recording offline with one of the events handlers.
+
+The recording is split into time chunks which are processed in parallel,
+much faster than real time. See pycaer/recording/batch_processing.py.
+
+Run according to the following examples:
+
+python bin/process_recording.py recording.caer filtered.caer --stage focus-filter --focal-point 64 64
+
+python bin/process_recording.py recording.caer counts.json --stage on-off-counter
+
+python bin/process_recording.py recording.caer flow.npy --stage optical-flow --processes 8
+"""
+
+import argparse
+
+from pycaer.dvs128.process_packets import MICROSECONDS_PER_MILLISECOND
+from pycaer.recording.batch_processing import STAGES, FocusFilterStage, process_recording
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording')
+    parser.add_argument('output')
+    parser.add_argument('--stage', choices=sorted(STAGES), required=True)
+    parser.add_argument('--chunk-duration', type=float, default=10000,
+                        help='milliseconds of recording per chunk')
+    parser.add_argument('--warm-up', type=float, default=100,
+                        help='milliseconds processed before each chunk to warm up the handler state')
+    parser.add_argument('--packet-duration', type=float, default=10,
+                        help='milliseconds of recording per packet given to the handler')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of processes (defaults to the number of CPUs)')
+    parser.add_argument('--focal-point', type=int, nargs=2, default=(64, 64))
+    parser.add_argument('--focus-std', type=float, default=10)
+    args = parser.parse_args()
+
+    if args.stage == 'focus-filter':
+        stage = FocusFilterStage(tuple(args.focal_point), args.focus_std)
+    else:
+        stage = STAGES[args.stage]()
+
+    statistics = process_recording(args.recording, args.output, stage,
+                                   int(args.chunk_duration * MICROSECONDS_PER_MILLISECOND),
+                                   int(args.warm_up * MICROSECONDS_PER_MILLISECOND),
+                                   int(args.packet_duration * MICROSECONDS_PER_MILLISECOND),
+                                   args.processes)
+
+    print 'Chunks:           {0}'.format(statistics['chunks'])
+    print 'Events:           {0}'.format(statistics['events'])
+    print 'Processing time:  {0:.2f} s'.format(statistics['elapsed_time'])
+    print 'Throughput:       {0:.0f} events/s'.format(statistics['events_per_second'])
+    print 'Real time factor: {0:.1f}x'.format(statistics['real_time_factor'])
+
+
+if __name__ == '__main__':
+    main()
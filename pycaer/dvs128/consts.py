@@ -14,11 +14,17 @@ CAER_HOST_CONFIG_USB = -1
 CAER_HOST_CONFIG_DATAEXCHANGE = -2
 CAER_HOST_CONFIG_PACKETS = -3
 
+CAER_HOST_CONFIG_USB_BUFFER_NUMBER = 0
+CAER_HOST_CONFIG_USB_BUFFER_SIZE = 1
+
 CAER_HOST_CONFIG_DATAEXCHANGE_BUFFER_SIZE = 0
 CAER_HOST_CONFIG_DATAEXCHANGE_BLOCKING = 1
 CAER_HOST_CONFIG_DATAEXCHANGE_START_PRODUCERS = 2
 CAER_HOST_CONFIG_DATAEXCHANGE_STOP_PRODUCERS = 3
 
+CAER_HOST_CONFIG_PACKETS_MAX_CONTAINER_PACKET_SIZE = 0
+CAER_HOST_CONFIG_PACKETS_MAX_CONTAINER_INTERVAL = 1
+
 DVS128_CONFIG_BIAS = 1
 DVS128_CONFIG_BIAS_DIFFOFF = 4
 DVS128_CONFIG_BIAS_DIFFON = 8
@@ -10,49 +10,58 @@ from packet_definitions import caerEventPacketContainer
 
 import ctypes
 
+# The library is loaded, and its function prototypes set, once per process
+# and shared by all the controllers. See "_get_libcaer"
+_libcaer = None
 
-class Controller(object):
-    DVS128_DEVICE_TYPE = 0  # DVS128 device (/usr/include/libcaer/devices/dvs128.h)
 
-    def __init__(self, device_id=0):
-        self._device_id = device_id
+def _get_libcaer():
+    global _libcaer
+
+    if _libcaer is not None:
+        return _libcaer
 
-        self._libcaer = ctypes.CDLL('libcaer.so')
+    # NOTE: The library is loaded on first use rather than on import, so
+    # modules which import the controller (without using a camera) neither
+    # pay for the loading nor require the library to be installed
+    libcaer = ctypes.CDLL('libcaer.so')
 
-        # NOTE: Some functions require configuration of their arguments and
-        # return types to match the library's configuration.
-        # Those functions which do not need explicit configuration are not
-        # written here and some implicit casting might occur in their parameters
-        # and return values
-        self._libcaer_func_caerDeviceOpen = self._libcaer.caerDeviceOpen
-        self._libcaer_func_caerDeviceOpen.restype = ctypes.c_void_p
-        
-        self._libcaer_func_caerDeviceClose = self._libcaer.caerDeviceClose
-        self._libcaer_func_caerDeviceClose.restype = ctypes.c_bool
+    # NOTE: Some functions require configuration of their arguments and
+    # return types to match the library's configuration.
+    # Those functions which do not need explicit configuration are not
+    # written here and some implicit casting might occur in their parameters
+    # and return values
+    libcaer.caerDeviceOpen.restype = ctypes.c_void_p
+    libcaer.caerDeviceClose.restype = ctypes.c_bool
+    libcaer.caerDeviceSendDefaultConfig.restype = ctypes.c_bool
+    libcaer.caerDeviceDataStart.restype = ctypes.c_bool
+    libcaer.caerDeviceDataStop.restype = ctypes.c_bool
+    libcaer.caerDeviceConfigSet.restype = ctypes.c_bool
+    libcaer.caerDeviceDataGet.restype = ctypes.POINTER(caerEventPacketContainer)
 
-        self._libcaer_func_caerDeviceSendDefaultConfig = self._libcaer.caerDeviceSendDefaultConfig
-        self._libcaer_func_caerDeviceSendDefaultConfig.restype = ctypes.c_bool
+    _libcaer = libcaer
 
-        self._libcaer_func_caerDeviceDataStart = self._libcaer.caerDeviceDataStart
-        self._libcaer_func_caerDeviceDataStart.restype = ctypes.c_bool
+    return _libcaer
 
-        self._libcaer_func_caerDeviceDataStop = self._libcaer.caerDeviceDataStop
-        self._libcaer_func_caerDeviceDataStop.restype = ctypes.c_bool
 
-        self._libcaer_func_caerDeviceConfigSet = self._libcaer.caerDeviceConfigSet
-        self._libcaer_func_caerDeviceConfigSet.restype = ctypes.c_bool
+class Controller(object):
+    DVS128_DEVICE_TYPE = 0  # DVS128 device (/usr/include/libcaer/devices/dvs128.h)
+
+    def __init__(self, device_id=0):
+        self._device_id = device_id
 
-        self._libcaer_func_caerDeviceDataGet = self._libcaer.caerDeviceDataGet
-        self._libcaer_func_caerDeviceDataGet.restype = ctypes.POINTER(caerEventPacketContainer)
+    @property
+    def _libcaer(self):
+        return _get_libcaer()
 
     def open_device(self):
         # The parameters passed to the function are the most basic and
         # simply allow access to the events created by the device
-        self._handle = self._libcaer_func_caerDeviceOpen(ctypes.c_uint16(self._device_id),
-                                                         ctypes.c_uint16(self.DVS128_DEVICE_TYPE),
-                                                         ctypes.c_uint8(0),
-                                                         ctypes.c_uint8(0),
-                                                         None)
+        self._handle = self._libcaer.caerDeviceOpen(ctypes.c_uint16(self._device_id),
+                                                    ctypes.c_uint16(self.DVS128_DEVICE_TYPE),
+                                                    ctypes.c_uint8(0),
+                                                    ctypes.c_uint8(0),
+                                                    None)
 
         # NOTE: Checking for NULL pointers is done by checking
         # the boolean value (rather than None, for example)
@@ -65,7 +74,7 @@ class Controller(object):
         # Create a temporary variable to hold the ctypes variable and
         # not the Pythonic 'int'. This variable can be passed by reference
         c_handle = ctypes.c_void_p(self._handle)
-        return self._libcaer_func_caerDeviceClose(ctypes.byref(c_handle))
+        return self._libcaer.caerDeviceClose(ctypes.byref(c_handle))
 
     def send_default_configuration(self):
         return self._libcaer.caerDeviceSendDefaultConfig(self._handle)
@@ -86,7 +95,7 @@ class Controller(object):
                                                  ctypes.c_uint32(extra_param))
 
     def get_data(self):
-        event_packet_container = self._libcaer_func_caerDeviceDataGet(self._handle)
+        event_packet_container = self._libcaer.caerDeviceDataGet(self._handle)
 
         if not event_packet_container:
             return None
@@ -8,6 +8,8 @@ from packet_definitions import caerPolarityEvent, caerPolarityEventPacket
 
 import ctypes
 
+import numpy as np
+
 
 class PolarityEvent(object):
     def __init__(self, event_address):
@@ -64,3 +66,18 @@ class PolarityEventPacket(object):
             events.append((events_buffer[i * 2], events_buffer[i * 2 + 1]))
 
         return events
+
+    def get_all_events_array(self):
+        """Get the events as an (N, 2) array of (data, timestamp) rows.
+
+        The events are copied out of the packet in a single operation, so
+        the array stays valid after the packet container is freed.
+        """
+
+        # NOTE: The same number of events as in "get_all_events" is read
+        number_of_events = max(0, self._event_packet.packetHeader.eventNumber - 1)
+
+        events_buffer = (ctypes.c_int32 * (number_of_events * 2)).from_address(
+            ctypes.addressof(self._event_packet.events))
+
+        return np.frombuffer(events_buffer, dtype=np.int32).reshape(-1, 2).copy()
@@ -4,6 +4,8 @@ in order to increase processing speed to maximum.
 
 import struct
 
+import numpy as np
+
 
 VALID_MARK_SHIFT = 0
 VALID_MARK_MASK = 0x00000001
@@ -14,6 +16,15 @@ Y_ADDR_MASK = 0x00007FFF
 X_ADDR_SHIFT = 17
 X_ADDR_MASK = 0x00007FFF
 
+# Timestamps are in microseconds
+TIMESTAMPS_PER_SECOND = 1000000
+MICROSECONDS_PER_MILLISECOND = 1000
+
+# Display colors of the polarities
+POLARITY_COLORS = np.array([(255, 0, 0),   # OFF
+                            (0, 255, 0)],  # ON
+                           dtype=np.uint8)
+
 def _get_polarity_event_data(data, shift, mask):
     return (data >> shift) & mask
 
@@ -22,3 +33,46 @@ def unpack_polarity_event_data(data):
             _get_polarity_event_data(data, POLARITY_SHIFT, POLARITY_MASK), \
             _get_polarity_event_data(data, Y_ADDR_SHIFT, Y_ADDR_MASK), \
             _get_polarity_event_data(data, X_ADDR_SHIFT, X_ADDR_MASK))
+
+
+# NOTE: The following functions are the vectorized counterparts of the
+# function above. They operate on a whole packet of events at once and
+# are the preferred way to decode events in performance critical code
+
+def events_to_array(events):
+    """Convert the events of a single packet (as returned by
+    "get_all_events") to an (N, 2) array of (data, timestamp) rows.
+    """
+
+    if isinstance(events, np.ndarray):
+        return events.reshape(-1, 2)
+
+    return np.array(events, dtype=np.int32).reshape(-1, 2)
+
+def unpack_polarity_events(events):
+    """Unpack an (N, 2) events array into arrays of the same fields
+    returned by "unpack_polarity_event_data".
+    """
+
+    data = events[:, 0]
+
+    return (_get_polarity_event_data(data, VALID_MARK_SHIFT, VALID_MARK_MASK), \
+            _get_polarity_event_data(data, POLARITY_SHIFT, POLARITY_MASK), \
+            _get_polarity_event_data(data, Y_ADDR_SHIFT, Y_ADDR_MASK), \
+            _get_polarity_event_data(data, X_ADDR_SHIFT, X_ADDR_MASK))
+
+def pack_polarity_events(x, y, polarity, timestamps):
+    """Build an (N, 2) events array of valid events from separate arrays.
+    This is the inverse of "unpack_polarity_events".
+    """
+
+    x = np.asarray(x, dtype=np.int32)
+    y = np.asarray(y, dtype=np.int32)
+    polarity = np.asarray(polarity, dtype=np.int32)
+
+    events = np.empty((len(x), 2), dtype=np.int32)
+    events[:, 0] = (x << X_ADDR_SHIFT) | (y << Y_ADDR_SHIFT) | \
+                   (polarity << POLARITY_SHIFT) | (1 << VALID_MARK_SHIFT)
+    events[:, 1] = timestamps
+
+    return events
@@ -4,18 +4,56 @@ Uses the simple PyGame engine.
 Visual processing is processor-time consuming. Currently it seems as if
 it's best to perform it in its own process.
 
-TODO:
-- The option to remove user pixels
+Each frame is built in a NumPy array and blitted to the screen once.
+User pixels (for example, annotations) are held in overlay layers drawn
+on top of the camera events:
+- A persistent layer, whose pixels stay until removed or cleared.
+- A frame layer, whose pixels are drawn for a single frame only.
+Since the layers are pixel arrays, the cost of drawing them is the same
+however many pixels were ever drawn.
+
+The latest frame is published as a snapshot (see the snapshot module),
+so the parent process may read it at any time (see "get_frame").
+
+PyGame is imported only within the rendering process, so processes
+which merely create the renderer or feed it do not load it.
 """
 
 import time
 import signal
-import pygame
 
+import numpy as np
 from multiprocessing import Process, Event, Queue
 from Queue import Empty
 
-from ..dvs128.process_packets import unpack_polarity_event_data
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events, POLARITY_COLORS
+from ..process.latency import LatencyTracker, split_stamp, monotonic_time
+from ..process.snapshot import Snapshot
+
+# Messages of the user queue. Lists of (position, color, is_static)
+# tuples are also accepted as drawing messages
+USER_DRAW = 0    # (USER_DRAW, is_static, x, y, colors)
+USER_REMOVE = 1  # (USER_REMOVE, x, y)
+USER_CLEAR = 2   # (USER_CLEAR,)
+
+
+class _OverlayLayer(object):
+    def __init__(self, width, height):
+        self._colors = np.zeros((width, height, 3), dtype=np.uint8)
+        self._mask = np.zeros((width, height), dtype=bool)
+
+    def draw(self, x, y, colors):
+        self._colors[x, y] = colors
+        self._mask[x, y] = True
+
+    def remove(self, x, y):
+        self._mask[x, y] = False
+
+    def clear(self):
+        self._mask.fill(False)
+
+    def composite(self, frame):
+        np.copyto(frame, self._colors, where=self._mask[:, :, np.newaxis])
 
 
 class Renderer(Process):
@@ -29,82 +67,117 @@ class Renderer(Process):
         self._multiplier = multiplier
         self._fps = fps
 
-        # A list of pixels to be drawn in each frame
-        self._static_pixels = []
-
         self._events_queue = Queue()
         self._user_queue = Queue()
         self._stop_running = Event()
 
+        # Records the time from acquisition until the packet's events
+        # were displayed on screen
+        self._latency_tracker = LatencyTracker('Renderer')
+        # Stamps of the packets drawn in the current frame
+        self._frame_stamps = []
+
+        self._frame_snapshot = Snapshot((self.FOV_WIDTH, self.FOV_HEIGHT, 3), np.uint8)
+
     def _init_signal_handling(self):
         signal.signal(signal.SIGINT, signal.SIG_IGN)
 
     def _init_rendering(self):
+        import pygame
+
         pygame.init()
 
         self._clock = pygame.time.Clock()
 
-        self._screen_width = self.FOV_WIDTH * self._multiplier 
+        self._screen_width = self.FOV_WIDTH * self._multiplier
         self._screen_height = self.FOV_HEIGHT * self._multiplier
 
         self._surface = pygame.Surface((self.FOV_WIDTH, self.FOV_HEIGHT))
         self._screen = pygame.display.set_mode((self._screen_width, self._screen_height))
 
+        # NOTE: The arrays are indexed by (x, y) in screen coordinates,
+        # as expected by pygame.surfarray
+        self._frame = np.zeros((self.FOV_WIDTH, self.FOV_HEIGHT, 3), dtype=np.uint8)
+        self._persistent_layer = _OverlayLayer(self.FOV_WIDTH, self.FOV_HEIGHT)
+        self._frame_layer = _OverlayLayer(self.FOV_WIDTH, self.FOV_HEIGHT)
+
+    def _to_screen_y(self, y):
+        # NOTE: The (0,0) coordinate of the DVS128 camera is at the
+        # *lower* left corner (like in OpenGL)
+        return self.FOV_HEIGHT - 1 - np.asarray(y)
+
     def _update_user_events(self):
         try:
-            events = self._user_queue.get_nowait()
+            message = self._user_queue.get_nowait()
         except Empty:
             return
 
-        # NOTE: "position" is a tuple of the type (x,y).
-        # "color" is a tuple of the type (r,g,b).
-        # "is_static" is True for static pixels (which always stay)
-        # or False for pixels which are updated only for a single frame.
-        for position, color, is_static in events:
-            if is_static:
-                self._static_pixels.append((position, color))
+        if isinstance(message, list):
+            # NOTE: "position" is a tuple of the type (x,y).
+            # "color" is a tuple of the type (r,g,b).
+            # "is_static" is True for static pixels (which always stay)
+            # or False for pixels which are updated only for a single frame.
+            for is_static in (True, False):
+                pixels = [(position, color) for position, color, pixel_is_static in message
+                          if bool(pixel_is_static) == is_static]
+                if pixels:
+                    positions, colors = zip(*pixels)
+                    x, y = zip(*positions)
+                    self._handle_user_message((USER_DRAW, is_static, x, y, colors))
+            return
+
+        self._handle_user_message(message)
 
-            x, y = position
-            self._surface.set_at((x, 127 - y), color)
+    def _handle_user_message(self, message):
+        if message[0] == USER_DRAW:
+            _, is_static, x, y, colors = message
+            layer = self._persistent_layer if is_static else self._frame_layer
+            layer.draw(np.asarray(x), self._to_screen_y(y), np.asarray(colors, dtype=np.uint8))
+        elif message[0] == USER_REMOVE:
+            _, x, y = message
+            self._persistent_layer.remove(np.asarray(x), self._to_screen_y(y))
+        elif message[0] == USER_CLEAR:
+            self._persistent_layer.clear()
+            self._frame_layer.clear()
 
     def _update_camera_events(self):
         try:
-            events = self._events_queue.get_nowait()
+            stamp, events = split_stamp(self._events_queue.get_nowait())
         except Empty:
             return
 
-        for data, timestamp in events:
-            valid_mark, polarity, y, x = unpack_polarity_event_data(data)
+        if stamp is not None:
+            self._frame_stamps.append(stamp)
 
-            if valid_mark == 0:
-                continue
+        events = events_to_array(events)
+        valid_mark, polarity, y, x = unpack_polarity_events(events)
 
-            if polarity == 0:
-                color = (255, 0, 0)        
-            elif polarity == 1:
-                color = (0, 255, 0)
-
-            # NOTE: The (0,0) coordinate of the DVS128 camera is at the
-            # *lower* left corner (like in OpenGL)
-            self._surface.set_at((x, 127 - y), color)
+        valid = valid_mark == 1
+        self._frame[x[valid], self._to_screen_y(y[valid])] = POLARITY_COLORS[polarity[valid]]
 
     def _render(self):
+        import pygame
+
         last_frame_time = 0
 
         while not self._stop_running.is_set():
-            self._surface.fill((0, 0, 0))
-
-            for position, color in self._static_pixels:
-                x, y = position
-                self._surface.set_at((x, 127 - y), color)
+            self._frame.fill(0)
 
             current_time = time.time()
             while current_time - last_frame_time < 1.0 / self._fps:
                 self._update_user_events()
                 self._update_camera_events()
-                
+
                 current_time = time.time()
 
+            self._persistent_layer.composite(self._frame)
+            self._frame_layer.composite(self._frame)
+            self._frame_layer.clear()
+
+            self._frame_snapshot.publish(self._frame)
+
+            pygame.surfarray.blit_array(self._surface, self._frame)
+
             self._clock.tick()
 
             # Print framerate and playtime in titlebar.
@@ -118,6 +191,11 @@ class Renderer(Process):
             # NOTE: The following is a serious time-consuming function
             pygame.display.flip()
 
+            display_time = monotonic_time()
+            for stamp in self._frame_stamps:
+                self._latency_tracker.record(stamp, display_time)
+            self._frame_stamps = []
+
             # Flush pipe to remove all events which were not drawn in this frame
             while not self._events_queue.empty():
                 self._events_queue.get_nowait()
@@ -130,6 +208,35 @@ class Renderer(Process):
     def get_user_queue(self):
         return self._user_queue
 
+    def draw_user_pixels(self, x, y, colors, is_static=True):
+        """Draw user pixels on top of the camera events. Coordinates are
+        in the camera coordinate system and "colors" holds an (r,g,b)
+        tuple per pixel. Static pixels stay until removed or cleared.
+        """
+
+        self._user_queue.put_nowait((USER_DRAW, is_static, np.asarray(x), np.asarray(y),
+                                     np.asarray(colors, dtype=np.uint8)))
+
+    def remove_user_pixels(self, x, y):
+        """Remove static user pixels."""
+
+        self._user_queue.put_nowait((USER_REMOVE, np.asarray(x), np.asarray(y)))
+
+    def clear_user_pixels(self):
+        self._user_queue.put_nowait((USER_CLEAR,))
+
+    def get_latency_tracker(self):
+        return self._latency_tracker
+
+    def get_frame(self):
+        """Get a copy of the latest frame, as a (width, height, 3) array
+        indexed by (x, y) in screen coordinates.
+        """
+
+        frame, _ = self._frame_snapshot.read()
+
+        return frame
+
     def run(self):
         self._init_signal_handling()
         self._init_rendering()
@@ -150,8 +257,14 @@ if __name__ == "__main__":
 
     demux.start()
 
+    # Mark the center of the field of view
+    renderer.draw_user_pixels(np.arange(60, 68), np.full(8, 64), [(0, 0, 255)] * 8)
+
     raw_input('Press any key to quit...')
 
     demux.stop()
 
     renderer.stop()
+
+    for tracker in (demux.get_latency_tracker(), renderer.get_latency_tracker()):
+        print tracker.get_statistics()
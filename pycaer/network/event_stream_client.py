@@ -0,0 +1,98 @@
+""" Module implementing a client of the events stream server.
+
+The client connects to an EventStreamServer, subscribes to a region
+of interest and yields the received batches as (N, 2) arrays of
+(data, timestamp) rows, in the same format as sent by the Demux module.
+"""
+
+import socket
+
+from .stream_protocol import FULL_ROI, BATCH_HEADER, EVENT_SIZE, \
+                             pack_subscription, unpack_batch_events
+
+
+class EventStreamClient(object):
+    def __init__(self, host='127.0.0.1', port=7777, roi=FULL_ROI, decimation=1):
+        self._address = (host, port)
+        self._roi = roi
+        self._decimation = decimation
+
+        self._socket = None
+
+        # Sequence number of the last batch received
+        self._last_sequence = None
+
+    def connect(self, timeout=None):
+        self._socket = socket.create_connection(self._address, timeout)
+        self._socket.settimeout(None)
+        self._socket.sendall(pack_subscription(self._roi, self._decimation))
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _receive_exactly(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self._socket.recv(size)
+            if not chunk:
+                raise EOFError('The server has closed the connection')
+
+            chunks.append(chunk)
+            size -= len(chunk)
+
+        return b''.join(chunks)
+
+    def receive(self, timeout=None):
+        """Receive a single batch of events. Returns None if no batch
+        has arrived within the timeout (in seconds).
+        """
+
+        self._socket.settimeout(timeout)
+        try:
+            header = self._socket.recv(BATCH_HEADER.size, socket.MSG_PEEK)
+        except socket.timeout:
+            return None
+        finally:
+            self._socket.settimeout(None)
+
+        if not header:
+            raise EOFError('The server has closed the connection')
+
+        sequence, number_of_events = BATCH_HEADER.unpack(self._receive_exactly(BATCH_HEADER.size))
+        self._last_sequence = sequence
+
+        return unpack_batch_events(self._receive_exactly(number_of_events * EVENT_SIZE))
+
+    def get_last_sequence(self):
+        return self._last_sequence
+
+    def __iter__(self):
+        """Yield the batches of events until the server disconnects."""
+
+        while True:
+            try:
+                yield self.receive()
+            except EOFError:
+                return
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 7777
+
+    with EventStreamClient(port=port) as client:
+        try:
+            for events in client:
+                print client.get_last_sequence(), len(events)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,215 @@
+""" Module implementing a TCP server which streams the camera events.
+
+The server is an events handler fed by the Demux module like any other
+handler. Unlike the handlers queues, which are fixed when the Demux is
+created, clients may connect to and disconnect from the server at any
+time. This allows analysis processes which do not own the camera to
+receive its events.
+
+Each client subscribes to a region of interest and a decimation factor
+(see the stream_protocol module) and only the matching events are sent
+to it. Every client has its own send buffer. Clients which do not keep
+up with the stream fill their buffer and are disconnected rather than
+delaying the other clients.
+"""
+
+import errno
+import select
+import socket
+from multiprocessing import Value
+
+from .stream_protocol import SUBSCRIPTION, pack_batch, unpack_subscription
+from ..process.camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events
+
+
+class _StreamClient(object):
+    def __init__(self, client_socket):
+        self.socket = client_socket
+        self.socket.setblocking(False)
+
+        self.subscription_message = b''
+        self.roi = None
+        self.decimation = 1
+        # Number of events of the region already passed since the
+        # last event sent, so decimation is continuous between batches
+        self.decimation_phase = 0
+
+        self.send_buffer = bytearray()
+
+    def is_subscribed(self):
+        return self.roi is not None
+
+
+class EventStreamServer(CameraEventsHandler):
+    # Shorter than the default to keep serving the sockets while
+    # no events arrive
+    _wait_timeout = 0.005
+
+    def __init__(self, host='127.0.0.1', port=0, max_send_buffer_size=4 * 1024 * 1024,
+                 backend=PROCESS_BACKEND):
+        super(EventStreamServer, self).__init__(backend)
+
+        # NOTE: The socket is bound in the parent process so the address
+        # is known (even when the port is chosen by the system) before
+        # the server process starts. The child process inherits it
+        self._listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listening_socket.bind((host, port))
+        self._listening_socket.listen(16)
+        self._address = self._listening_socket.getsockname()
+
+        self._max_send_buffer_size = max_send_buffer_size
+
+        self._clients = []
+        self._sequence = 0
+
+        self._number_of_clients = Value('i', 0)
+        self._number_of_evictions = Value('i', 0)
+
+    def _accept_client(self):
+        try:
+            client_socket, _ = self._listening_socket.accept()
+        except socket.error:
+            return
+
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._clients.append(_StreamClient(client_socket))
+        self._number_of_clients.value = len(self._clients)
+
+    def _remove_client(self, client):
+        client.socket.close()
+        self._clients.remove(client)
+        self._number_of_clients.value = len(self._clients)
+
+    def _evict_client(self, client):
+        self._remove_client(client)
+        self._number_of_evictions.value += 1
+
+    def _receive_from_client(self, client):
+        try:
+            data = client.socket.recv(SUBSCRIPTION.size)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            data = b''
+
+        if not data:
+            # The client has disconnected
+            self._remove_client(client)
+            return
+
+        if client.is_subscribed():
+            # NOTE: Clients are not expected to send anything after
+            # subscribing. Such data is ignored
+            return
+
+        client.subscription_message += data
+        if len(client.subscription_message) == SUBSCRIPTION.size:
+            client.roi, client.decimation = unpack_subscription(client.subscription_message)
+
+    def _send_to_client(self, client):
+        try:
+            sent = client.socket.send(client.send_buffer)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            self._remove_client(client)
+            return
+
+        del client.send_buffer[:sent]
+
+    def _poll(self):
+        readable = [self._listening_socket] + [client.socket for client in self._clients]
+        writable = [client.socket for client in self._clients if client.send_buffer]
+
+        readable, writable, _ = select.select(readable, writable, [], 0)
+
+        if self._listening_socket in readable:
+            self._accept_client()
+
+        # NOTE: Iterating over a copy since clients may be removed
+        for client in list(self._clients):
+            if client.socket in readable:
+                self._receive_from_client(client)
+
+            if client in self._clients and client.socket in writable:
+                self._send_to_client(client)
+
+    def _select_client_events(self, client, events, x, y):
+        x_start, y_start, x_end, y_end = client.roi
+
+        in_roi = (x >= x_start) & (x < x_end) & (y >= y_start) & (y < y_end)
+        selected = events[in_roi]
+
+        if client.decimation > 1:
+            first = (-client.decimation_phase) % client.decimation
+            client.decimation_phase = (client.decimation_phase + len(selected)) % client.decimation
+            selected = selected[first::client.decimation]
+
+        return selected
+
+    def _handle_events(self, events):
+        events = events_to_array(events)
+        _, _, y, x = unpack_polarity_events(events)
+
+        # NOTE: Stamped packets are sent with the Demux sequence number
+        # so clients may detect packets lost before reaching the server
+        sequence = self._sequence
+        if self._current_stamp is not None:
+            sequence = self._current_stamp.sequence
+
+        for client in list(self._clients):
+            if not client.is_subscribed():
+                continue
+
+            client.send_buffer += pack_batch(sequence, self._select_client_events(client, events, x, y))
+
+            if len(client.send_buffer) > self._max_send_buffer_size:
+                self._evict_client(client)
+                continue
+
+            self._send_to_client(client)
+
+        self._sequence += 1
+
+    def _fini_handler(self):
+        for client in list(self._clients):
+            self._remove_client(client)
+        self._listening_socket.close()
+
+    def start(self):
+        super(EventStreamServer, self).start()
+
+        # NOTE: The server process holds its own copy of the socket. The
+        # parent's copy is closed so no client connects to it once the
+        # server process exits
+        if self.get_backend() == PROCESS_BACKEND:
+            self._listening_socket.close()
+
+    def get_address(self):
+        """Get the (host, port) address clients should connect to."""
+
+        return self._address
+
+    def get_number_of_clients(self):
+        return self._number_of_clients.value
+
+    def get_number_of_evictions(self):
+        return self._number_of_evictions.value
+
+
+if __name__ == '__main__':
+    from pycaer.process.demux import Demux
+
+    server = EventStreamServer(port=7777)
+    demux = Demux([server.get_events_queue()])
+
+    server.start()
+    demux.start()
+
+    print 'Streaming events on {0}:{1}'.format(*server.get_address())
+    raw_input('Press any key to quit...')
+
+    demux.stop()
+    server.stop()
@@ -0,0 +1,50 @@
+""" Module defining the binary framing of the events stream.
+
+A connection is made of the following messages:
+1) A single subscription message sent by the client right after
+   connecting. It holds the region of interest (x_start, y_start, x_end,
+   y_end) with exclusive ends, and the decimation factor (only every
+   n-th event in the region is sent).
+2) Batches of events sent by the server. Each batch is a header of
+   the batch sequence number and the number of events, followed by the
+   events themselves as pairs of little-endian 32-bit integers
+   (data, timestamp), exactly as sent by the camera.
+"""
+
+import struct
+
+import numpy as np
+
+SUBSCRIPTION = struct.Struct('<4hI')
+BATCH_HEADER = struct.Struct('<2I')
+
+EVENT_DTYPE = np.dtype('<i4')
+EVENT_SIZE = 2 * EVENT_DTYPE.itemsize
+
+# The entire field of view of the DVS128
+FULL_ROI = (0, 0, 128, 128)
+
+
+def pack_subscription(roi=FULL_ROI, decimation=1):
+    x_start, y_start, x_end, y_end = roi
+
+    return SUBSCRIPTION.pack(x_start, y_start, x_end, y_end, decimation)
+
+def unpack_subscription(message):
+    """Returns a tuple of (roi, decimation)."""
+
+    x_start, y_start, x_end, y_end, decimation = SUBSCRIPTION.unpack(message)
+
+    return ((x_start, y_start, x_end, y_end), max(1, decimation))
+
+def pack_batch(sequence, events):
+    """Pack an (N, 2) events array into a batch message."""
+
+    events = np.ascontiguousarray(events, dtype=EVENT_DTYPE)
+
+    return BATCH_HEADER.pack(sequence & 0xFFFFFFFF, len(events)) + events.tobytes()
+
+def unpack_batch_events(payload):
+    """Convert the payload of a batch message to an (N, 2) events array."""
+
+    return np.frombuffer(payload, dtype=EVENT_DTYPE).reshape(-1, 2)
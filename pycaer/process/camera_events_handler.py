@@ -1,25 +1,157 @@
 """ Module which implements a generic events handler from the camera.
 
-The handler runs as a separate process with its own queue.
-The queue should be passed to an events producer (for example,
-the Demux module). The process is then run and reads the events
-from the queue. Each event container packet triggers a call
+The handler has its own queue. The queue should be passed to an
+events producer (for example, the Demux module). The handler reads
+the events from the queue. Each event container packet triggers a call
 to the handler function, which is implemented in each handler
 locally.
+
+The execution backend of the handler is chosen on construction:
+- PROCESS_BACKEND: the handler runs as a separate process (the default).
+  Packets are pickled through a multiprocessing queue.
+- THREAD_BACKEND: the handler runs as a thread of the process which
+  feeds it (for example, within the Demux process). The thread is started
+  by the producer's first packet, and packets are passed by reference
+  through a thread queue. Useful for NumPy work, which releases the GIL,
+  so the handler runs alongside its producer without any IPC cost.
+- INLINE_BACKEND: the handler function is called by the producer itself
+  when it puts a packet in the queue, in the producer's context (for
+  example, within the Demux process). Avoids any IPC cost for
+  lightweight handlers.
+
+Packets stamped by the producer (see the latency module) are unwrapped
+before calling the handler function, and the latency of each packet is
+recorded once it is handled. Handlers which forward their output should
+do so using "_put_output", so the output carries the packet's stamp.
+
+Handlers whose state should be observable by the parent process publish
+it with "_publish_snapshot" (see the snapshot module), and the parent
+reads it with "get_snapshot".
 """
 
+import os
 import signal
-import ctypes
+import threading
 from multiprocessing import Process, Queue, Event
+import Queue as thread_queue
 from Queue import Empty
 
+from .latency import LatencyTracker, StampedPacket, split_stamp
+from .snapshot import Snapshot
+
+PROCESS_BACKEND = 'process'
+THREAD_BACKEND = 'thread'
+INLINE_BACKEND = 'inline'
+
+BACKENDS = (PROCESS_BACKEND, THREAD_BACKEND, INLINE_BACKEND)
+
+
+# Put in the queue of a thread handler when it is closed
+_CLOSED_QUEUE = object()
+
+
+class ThreadQueue(thread_queue.Queue):
+    """The events queue of a thread handler. Putting the first packet in
+    it starts the handler's thread in the putting process. Once closed,
+    the queue cannot be reused.
+    """
+
+    def __init__(self, handler):
+        thread_queue.Queue.__init__(self)
+
+        self._handler = handler
+        # The process in which the handler's thread was started
+        self._worker_pid = None
+        self._closed = False
+
+    def put(self, item, block=True, timeout=None):
+        # NOTE: Restarting the handler would initialize it again (for
+        # example, a recorder would overwrite its recording)
+        if self._closed:
+            raise ValueError('The queue of {0} is closed'.format(
+                self._handler.__class__.__name__))
+
+        if self._worker_pid != os.getpid():
+            # NOTE: The producer may run in another process than the one
+            # which created the handler (for example, the Demux process).
+            # The state of the queue copied from the parent is dropped
+            thread_queue.Queue.__init__(self)
+            self._worker_pid = os.getpid()
+            self._handler._start_thread()
+
+        thread_queue.Queue.put(self, item, block, timeout)
+
+    def close(self):
+        """Called by the producer once it will not put any more packets.
+        Waits for the handler to handle the packets already put.
+        """
+
+        if self._closed or self._worker_pid != os.getpid():
+            return
+
+        self._closed = True
+        thread_queue.Queue.put(self, _CLOSED_QUEUE)
+        self._handler.join()
+
+
+class InlineQueue(object):
+    """The events queue of an inline handler. Putting a packet in it
+    calls the handler immediately.
+    """
+
+    def __init__(self, handler):
+        self._handler = handler
 
-class CameraEventsHandler(Process):
-    def __init__(self):
-        super(CameraEventsHandler, self).__init__()
+    def put_nowait(self, item):
+        self._handler._handle_inline(item)
+
+    put = put_nowait
+
+    def get_nowait(self):
+        raise Empty
+
+    def empty(self):
+        return True
+
+    def close(self):
+        """Called by the producer once it will not put any more packets."""
+
+        self._handler._close_inline()
+
+
+class CameraEventsHandler(object):
+    # Time to wait for events before checking for the stopping signal
+    # and calling the "_poll" method again
+    _wait_timeout = 0.1
+
+    def __init__(self, backend=PROCESS_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend {0}'.format(backend))
+
+        self._backend = backend
+
+        if backend == PROCESS_BACKEND:
+            self._events_queue = Queue()
+        elif backend == THREAD_BACKEND:
+            self._events_queue = ThreadQueue(self)
+        else:
+            self._events_queue = InlineQueue(self)
 
-        self._events_queue = Queue()
         self._stop_running = Event()
+        self._worker = None
+
+        # The process in which an inline handler was initialized
+        self._inline_pid = None
+
+        self._latency_tracker = LatencyTracker(self.__class__.__name__)
+        # The stamp of the packet currently being handled
+        self._current_stamp = None
+
+        # Created by handlers which publish their state (see "_init_snapshot")
+        self._snapshot = None
+
+    def get_backend(self):
+        return self._backend
 
     def get_events_queue(self):
         """Get the events queue of the handler to be passed
@@ -36,18 +168,162 @@ class CameraEventsHandler(Process):
                 # NOTE: Apparently this is possible
                 break
 
-    def run(self):
-        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    def get_latency_tracker(self):
+        return self._latency_tracker
+
+    def get_snapshot(self):
+        """Get a consistent copy of the latest state published by the
+        handler and its version (the number of times it was published).
+        Raises ValueError if the handler publishes no state.
+        """
+
+        if self._snapshot is None:
+            raise ValueError('{0} publishes no snapshot'.format(self.__class__.__name__))
+
+        return self._snapshot.read()
+
+    def _init_snapshot(self, shape, dtype):
+        """Create the shared memory of the handler's state. Must be called
+        on construction, before the handler is started.
+        """
 
-        while not self._stop_running.is_set():
-            # Added a timeout to enable the process to check for stopping
-            # signal even if the demuxer has stopped and the queue is empty.
+        self._snapshot = Snapshot(shape, dtype)
+
+    def _publish_snapshot(self, state):
+        self._snapshot.publish(state)
+
+    def _put_output(self, queue, output):
+        """Put the output of the handler in a queue, stamped with the
+        stamp of the packet being handled (if it has one).
+        """
+
+        if self._current_stamp is not None:
+            output = StampedPacket(self._current_stamp.sequence,
+                                   self._current_stamp.acquisition_time,
+                                   output)
+
+        queue.put_nowait(output)
+
+    def _process_queue_item(self, item):
+        self._current_stamp, events = split_stamp(item)
+
+        self._handle_events(events)
+
+        if self._current_stamp is not None:
+            self._latency_tracker.record(self._current_stamp)
+            self._current_stamp = None
+
+    def _drain_queue(self):
+        """Handle the packets left in the queue once the handler has
+        stopped. Handlers which must not lose the last packets (for
+        example, recorders) call it from "_fini_handler".
+        """
+
+        while not self._events_queue.empty():
             try:
-                events = self._events_queue.get(timeout=0.1)
+                item = self._events_queue.get_nowait()
             except Empty:
-                continue
+                break
+
+            if item is not _CLOSED_QUEUE:
+                self._process_queue_item(item)
+
+    def _init_handler(self):
+        """Called before the first packet is handled, in the context in
+        which packets are handled. Handlers which hold resources (for
+        example, open files) should create them here.
+        """
+
+        pass
+
+    def _fini_handler(self):
+        """Called once the handler has stopped, in the same context as
+        "_init_handler".
+        """
+
+        pass
+
+    def _poll(self):
+        """Called on each iteration of the handler loop, whether events
+        arrived or not. Handlers which have other work besides handling
+        events (for example, serving sockets) may implement it.
+        """
+
+        pass
+
+    def _handle_inline(self, item):
+        if self._stop_running.is_set():
+            return
+
+        # NOTE: The producer may run in another process than the one
+        # which created the handler, so initialization is done lazily
+        if self._inline_pid != os.getpid():
+            self._inline_pid = os.getpid()
+            self._init_handler()
+
+        self._poll()
+        self._process_queue_item(item)
+
+    def _close_inline(self):
+        if self._inline_pid == os.getpid():
+            self._inline_pid = None
+            self._fini_handler()
+
+    def run(self):
+        if self._backend == PROCESS_BACKEND:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        self._init_handler()
+
+        try:
+            while not self._stop_running.is_set():
+                self._poll()
+
+                # Added a timeout to enable the process to check for stopping
+                # signal even if the demuxer has stopped and the queue is empty.
+                try:
+                    item = self._events_queue.get(timeout=self._wait_timeout)
+                except Empty:
+                    continue
 
-            self._handle_events(events)
+                if item is _CLOSED_QUEUE:
+                    break
+
+                self._process_queue_item(item)
+        finally:
+            self._fini_handler()
+
+    def _start_thread(self):
+        self._worker = threading.Thread(target=self.run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def start(self):
+        # NOTE: Thread handlers are started by the first packet put in
+        # their queue, and inline handlers are run by their producer
+        if self._backend != PROCESS_BACKEND:
+            return
+
+        self._worker = Process(target=self.run)
+        self._worker.start()
+
+    def join(self, timeout=None):
+        """Wait for the handler's process, or its thread if it runs in
+        this process.
+        """
+
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def is_alive(self):
+        if self._worker is None:
+            return False
+
+        return self._worker.is_alive()
 
     def stop(self):
         self._stop_running.set()
+
+        # NOTE: An inline handler run by a producer in this process is
+        # finalized here. Otherwise, the producer closes the queue
+        self._close_inline()
@@ -0,0 +1,247 @@
+""" Module implementing a tracker of moving objects as event clusters.
+
+The tracker keeps a fixed number of cluster slots in arrays. Each active
+cluster has a position, a velocity and a mass (the decaying number of
+events it has absorbed). For each batch of events:
+1) The masses decay exponentially with time and clusters whose mass is
+   too low are released.
+2) Cluster positions are predicted by their velocity, and clusters
+   predicted outside the field of view are released (for example, a
+   cluster which lost its object when it bounced off an edge).
+3) Every event is assigned to the nearest cluster within the cluster
+   radius, using a single (events x clusters) distances array.
+4) Clusters move towards the mean of their events, weighted by their mass,
+   and their velocities are updated from the movement.
+5) Dense groups of unassigned events seed new clusters in free slots.
+6) Clusters closer than the cluster radius are merged.
+
+The state of the clusters is published as a snapshot after every batch
+(see the snapshot module), so the parent process may read it at any time
+(see "get_clusters").
+"""
+
+import numpy as np
+
+from .camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events, \
+                                      TIMESTAMPS_PER_SECOND
+
+# Columns of the published cluster state
+CLUSTER_ACTIVE = 0
+CLUSTER_X = 1
+CLUSTER_Y = 2
+CLUSTER_VX = 3
+CLUSTER_VY = 4
+CLUSTER_MASS = 5
+CLUSTER_LAST_TIME = 6
+CLUSTER_FIELDS = 7
+
+
+class ClusterTracker(CameraEventsHandler):
+    def __init__(self, output_queue=None, capacity=16, radius=8, decay_time=50000, min_mass=10,
+                 seed_events=20, velocity_mixing=0.2, resolution=128, backend=PROCESS_BACKEND):
+        super(ClusterTracker, self).__init__(backend)
+
+        self._output_queue = output_queue # Optional. Receives the active clusters after every batch
+
+        self._capacity = capacity # Maximal number of clusters tracked at once
+        self._radius = radius # Events within this distance (in pixels) of a cluster are assigned to it
+        self._decay_time = decay_time # Time constant (in microseconds) of the decay of the masses
+        self._min_mass = min_mass # Clusters with a lower mass are released
+        self._seed_events = seed_events # Unassigned events needed in a cell to seed a cluster
+        self._velocity_mixing = velocity_mixing # Weight of a new velocity measurement
+        self._resolution = resolution
+
+        self._active = np.zeros(capacity, dtype=bool)
+        self._position = np.zeros((capacity, 2))
+        self._velocity = np.zeros((capacity, 2))
+        self._mass = np.zeros(capacity)
+        self._last_time = np.zeros(capacity, dtype=np.int64)
+
+        self._init_snapshot((capacity, CLUSTER_FIELDS), np.float64)
+
+    def _decay(self, timestamp):
+        elapsed_time = np.maximum(timestamp - self._last_time, 0)
+        self._mass *= np.exp(-elapsed_time / float(self._decay_time))
+        self._last_time[self._active] = timestamp
+
+        self._active &= self._mass >= self._min_mass
+        self._mass[~self._active] = 0
+
+    def _release_outside(self, predicted):
+        outside = ((predicted < 0) | (predicted >= self._resolution)).any(axis=1)
+
+        self._active &= ~outside
+        self._mass[~self._active] = 0
+
+    def _assign(self, positions, predicted):
+        """Returns the index of the cluster of each event, or -1."""
+
+        assignment = np.full(len(positions), -1, dtype=np.intp)
+
+        active = np.flatnonzero(self._active)
+        if len(active) == 0:
+            return assignment
+
+        differences = positions[:, np.newaxis, :] - predicted[active][np.newaxis, :, :]
+        squared_distances = (differences * differences).sum(axis=2)
+
+        nearest = squared_distances.argmin(axis=1)
+        is_near = squared_distances[np.arange(len(positions)), nearest] <= self._radius ** 2
+        assignment[is_near] = active[nearest[is_near]]
+
+        return assignment
+
+    def _update_clusters(self, positions, assignment, predicted, elapsed_seconds):
+        assigned = assignment >= 0
+        clusters = assignment[assigned]
+
+        count = np.bincount(clusters, minlength=self._capacity).astype(np.float64)
+        sum_x = np.bincount(clusters, weights=positions[assigned, 0], minlength=self._capacity)
+        sum_y = np.bincount(clusters, weights=positions[assigned, 1], minlength=self._capacity)
+
+        updated = count > 0
+        total_mass = self._mass[updated] + count[updated]
+
+        new_position = np.empty((updated.sum(), 2))
+        new_position[:, 0] = (predicted[updated, 0] * self._mass[updated] + sum_x[updated]) / total_mass
+        new_position[:, 1] = (predicted[updated, 1] * self._mass[updated] + sum_y[updated]) / total_mass
+
+        measured_velocity = (new_position - self._position[updated]) / elapsed_seconds[updated, np.newaxis]
+        self._velocity[updated] += self._velocity_mixing * (measured_velocity - self._velocity[updated])
+
+        self._position[updated] = new_position
+        self._mass[updated] = total_mass
+
+    def _seed_clusters(self, positions, timestamp):
+        free = np.flatnonzero(~self._active)
+        if len(free) == 0 or len(positions) < self._seed_events:
+            return
+
+        # Unassigned events are binned into cells of the cluster's size.
+        # The densest cells become clusters centered at their events' mean
+        cells_per_row = -(-self._resolution // self._radius)
+        cell = (positions[:, 0] // self._radius).astype(np.intp) * cells_per_row + \
+               (positions[:, 1] // self._radius).astype(np.intp)
+
+        count = np.bincount(cell, minlength=cells_per_row * cells_per_row)
+        seeds = np.flatnonzero(count >= self._seed_events)
+        seeds = seeds[np.argsort(-count[seeds])][:len(free)]
+        if len(seeds) == 0:
+            return
+
+        sum_x = np.bincount(cell, weights=positions[:, 0], minlength=len(count))
+        sum_y = np.bincount(cell, weights=positions[:, 1], minlength=len(count))
+
+        slots = free[:len(seeds)]
+        self._active[slots] = True
+        self._position[slots, 0] = sum_x[seeds] / count[seeds]
+        self._position[slots, 1] = sum_y[seeds] / count[seeds]
+        self._velocity[slots] = 0
+        self._mass[slots] = count[seeds]
+        self._last_time[slots] = timestamp
+
+    def _merge_clusters(self):
+        active = np.flatnonzero(self._active)
+
+        differences = self._position[active][:, np.newaxis, :] - self._position[active][np.newaxis, :, :]
+        is_close = np.triu((differences * differences).sum(axis=2) < self._radius ** 2, 1)
+
+        # NOTE: There are only a few clusters, so looping over the close
+        # pairs (rather than over events) is cheap
+        for first, second in zip(*np.nonzero(is_close)):
+            first, second = active[first], active[second]
+            if not (self._active[first] and self._active[second]):
+                continue
+
+            total_mass = self._mass[first] + self._mass[second]
+            for state in (self._position, self._velocity):
+                state[first] = (state[first] * self._mass[first] +
+                                state[second] * self._mass[second]) / total_mass
+
+            self._mass[first] = total_mass
+            self._mass[second] = 0
+            self._active[second] = False
+
+    def _publish(self):
+        state = np.zeros((self._capacity, CLUSTER_FIELDS))
+        state[:, CLUSTER_ACTIVE] = self._active
+        state[:, CLUSTER_X:CLUSTER_Y + 1] = self._position
+        state[:, CLUSTER_VX:CLUSTER_VY + 1] = self._velocity
+        state[:, CLUSTER_MASS] = self._mass
+        state[:, CLUSTER_LAST_TIME] = self._last_time
+
+        self._publish_snapshot(state)
+
+        return state[self._active]
+
+    def track(self, events):
+        """Update the clusters with a batch of events and return the
+        state of the active clusters (see "get_clusters").
+        """
+
+        events = events_to_array(events)
+        valid_mark, _, y, x = unpack_polarity_events(events)
+
+        valid = valid_mark == 1
+        if not valid.any():
+            return self._publish()
+
+        positions = np.column_stack((x[valid], y[valid])).astype(np.float64)
+        # NOTE: The whole batch is treated as happening at its last timestamp.
+        # Camera packets span a few milliseconds at most
+        timestamp = int(events[valid, 1][-1])
+
+        elapsed_seconds = np.maximum(timestamp - self._last_time, 1) / float(TIMESTAMPS_PER_SECOND)
+
+        self._decay(timestamp)
+
+        predicted = self._position + self._velocity * elapsed_seconds[:, np.newaxis]
+        self._release_outside(predicted)
+
+        assignment = self._assign(positions, predicted)
+        self._update_clusters(positions, assignment, predicted, elapsed_seconds)
+        self._seed_clusters(positions[assignment < 0], timestamp)
+        self._merge_clusters()
+
+        return self._publish()
+
+    def _handle_events(self, events):
+        clusters = self.track(events)
+
+        if self._output_queue is not None:
+            self._put_output(self._output_queue, clusters)
+
+    def get_clusters(self):
+        """Get the latest state of the active clusters as an array with
+        a row per cluster. The columns are given by the CLUSTER_* consts.
+        Positions are in pixels and velocities in pixels per second.
+        """
+
+        state, _ = self.get_snapshot()
+
+        return state[state[:, CLUSTER_ACTIVE] > 0]
+
+
+if __name__ == '__main__':
+    import time
+    from pycaer.process.demux import Demux
+
+    tracker = ClusterTracker()
+    demux = Demux([tracker.get_events_queue()])
+
+    tracker.start()
+    demux.start()
+
+    while True:
+        try:
+            for cluster in tracker.get_clusters():
+                print 'x={0:5.1f} y={1:5.1f} vx={2:7.1f} vy={3:7.1f} mass={4:7.1f}'.format(
+                    *cluster[CLUSTER_X:CLUSTER_MASS + 1])
+            print
+            time.sleep(0.1)
+        except KeyboardInterrupt:
+            break
+
+    demux.stop()
+    tracker.stop()
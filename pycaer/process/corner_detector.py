@@ -0,0 +1,163 @@
+""" Module implementing an event-based corner detector.
+
+The detector implements the "eFAST" method of Mueggler et al. For every
+event, two circles around it are taken from the timestamp surface of
+its polarity: an inner circle of radius 3 (16 pixels) and an outer
+circle of radius 4 (20 pixels). The event is a corner if each circle
+has a contiguous arc of pixels (3 to 6 pixels on the inner circle, 4 to
+8 on the outer one) which are all more recent than the rest of the
+circle. A moving straight edge never forms such a short arc, while the
+tip of a moving corner does.
+
+The whole batch of events is processed at once: the circles are gathered
+into (events x pixels) arrays, and the minimum of every arc and the
+maximum of its complement are computed for all the arcs together by
+sliding along the circle, without a Python loop over the events.
+
+Only the corner events are forwarded to the output queue, as an (N, 2)
+array in the same format as the input events. This reduces the stream
+by one to two orders of magnitude for the downstream handlers.
+"""
+
+import numpy as np
+
+from .camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from .timestamp_surface import TimestampSurface, NO_EVENT
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events
+
+# (x, y) offsets of the circles, in order around the circle
+INNER_CIRCLE = np.array([[0, 3], [1, 3], [2, 2], [3, 1], [3, 0], [3, -1], [2, -2], [1, -3],
+                         [0, -3], [-1, -3], [-2, -2], [-3, -1], [-3, 0], [-3, 1], [-2, 2], [-1, 3]])
+OUTER_CIRCLE = np.array([[0, 4], [1, 4], [2, 3], [3, 2], [4, 1], [4, 0], [4, -1], [3, -2],
+                         [2, -3], [1, -4], [0, -4], [-1, -4], [-2, -3], [-3, -2], [-4, -1],
+                         [-4, 0], [-4, 1], [-3, 2], [-2, 3], [-1, 4]])
+
+# Minimal and maximal lengths of the arc of recent pixels on each circle
+INNER_ARC_LENGTHS = (3, 6)
+OUTER_ARC_LENGTHS = (4, 8)
+
+# Events closer than this to the edge of the field of view are never corners
+BORDER = 4
+
+
+def _sliding_extremes(circles, lengths, function):
+    """Apply "function" (np.minimum or np.maximum) over every arc of the
+    given lengths. Returns a dictionary from each length to an (N, K)
+    array whose column s holds the result for the arc starting at s.
+    """
+
+    number_of_pixels = circles.shape[1]
+    # The circle twice, so arcs which wrap around are contiguous
+    extended = np.concatenate((circles, circles), axis=1)
+
+    extremes = {}
+    result = circles
+    for length in xrange(1, max(lengths) + 1):
+        if length > 1:
+            result = function(result, extended[:, length - 1:length - 1 + number_of_pixels])
+        if length in lengths:
+            extremes[length] = result
+
+    return extremes
+
+def has_recent_arc(circles, min_length, max_length):
+    """Check whether each row of an (N, K) array of circle timestamps has
+    an arc of min_length to max_length pixels all more recent than the
+    rest of the circle. Returns a boolean array of length N.
+    """
+
+    number_of_pixels = circles.shape[1]
+    arc_lengths = range(min_length, max_length + 1)
+
+    arc_minimums = _sliding_extremes(circles, arc_lengths, np.minimum)
+    rest_maximums = _sliding_extremes(circles, [number_of_pixels - length
+                                                for length in arc_lengths], np.maximum)
+
+    found = np.zeros(len(circles), dtype=bool)
+    for length in arc_lengths:
+        # The rest of the arc starting at s is the arc starting at s + length.
+        # Rolling aligns it with column s
+        rest_maximum = np.roll(rest_maximums[number_of_pixels - length], -length, axis=1)
+        found |= (arc_minimums[length] > rest_maximum).any(axis=1)
+
+    return found
+
+
+class CornerDetector(CameraEventsHandler):
+    def __init__(self, output_queue, resolution=128, backend=PROCESS_BACKEND):
+        super(CornerDetector, self).__init__(backend)
+
+        self._output_queue = output_queue
+
+        self._resolution = resolution
+
+        # Separate surfaces are kept for ON and OFF events, as in eFAST
+        self._surface = TimestampSurface(resolution, polarities=2)
+
+    def _gather_circles(self, circle, x, y, timestamps, polarity):
+        circles = self._surface.gather(x, y, circle[:, 0], circle[:, 1], polarity)
+
+        # NOTE: Events later in the batch are already on the surface. The
+        # timestamps such pixels had before them are unknown. They are
+        # treated as the oldest, which is what they were for the pixels
+        # ahead of a moving edge
+        circles[circles > timestamps[:, np.newaxis]] = NO_EVENT
+
+        return circles
+
+    def detect_corners(self, events):
+        """Update the timestamp surfaces with a batch of events and return
+        the corner events, as an (N, 2) array of (data, timestamp) rows.
+        """
+
+        events = events_to_array(events)
+        valid_mark, polarity, y, x = unpack_polarity_events(events)
+
+        valid = valid_mark == 1
+        timestamps = events[:, 1].astype(np.int64)
+
+        self._surface.update(x[valid], y[valid], timestamps[valid], polarity[valid])
+
+        candidates = np.flatnonzero(valid &
+                                    (x >= BORDER) & (x < self._resolution - BORDER) &
+                                    (y >= BORDER) & (y < self._resolution - BORDER))
+
+        # The outer circle is checked only for the events which pass
+        # the inner circle, which are a small fraction of them
+        for circle, (min_length, max_length) in ((INNER_CIRCLE, INNER_ARC_LENGTHS),
+                                                 (OUTER_CIRCLE, OUTER_ARC_LENGTHS)):
+            circles = self._gather_circles(circle, x[candidates], y[candidates],
+                                           timestamps[candidates], polarity[candidates])
+            candidates = candidates[has_recent_arc(circles, min_length, max_length)]
+
+        return events[candidates]
+
+    def _handle_events(self, events):
+        self._put_output(self._output_queue, self.detect_corners(events))
+
+
+if __name__ == '__main__':
+    from multiprocessing import Queue
+    from Queue import Empty
+    from pycaer.process.demux import Demux
+    from pycaer.process.latency import split_stamp
+
+    corners_queue = Queue()
+    corner_detector = CornerDetector(corners_queue)
+    demux = Demux([corner_detector.get_events_queue()])
+
+    corner_detector.start()
+    demux.start()
+
+    while True:
+        try:
+            _, corners = split_stamp(corners_queue.get(timeout=0.1))
+            _, _, y, x = unpack_polarity_events(corners)
+            print '{0} corners {1}'.format(len(corners), zip(x, y)[:5])
+        except Empty:
+            continue
+        except KeyboardInterrupt:
+            break
+
+    demux.stop()
+    corner_detector.stop()
@@ -2,26 +2,109 @@
 
 Several handlers may register to the different camera events
 and they will be called in succession for each event.
+
+Each packet is stamped with a sequence number and its acquisition
+time before it is sent to the handlers (see the latency module).
+
+Acquisition and dispatch are decoupled. A reader thread keeps draining
+the camera and copies every packet into a double buffer, while the
+demux process swaps the buffer and sends the packets it collected to
+the handlers. Slow handlers queues therefore delay only the dispatch,
+and never the reading of the camera's data exchange buffer.
 """
 
 from multiprocessing import Process, Value, Event
 import signal
+import threading
 
 from ..dvs128.controller import Controller
 from ..dvs128.consts import *
 from ..dvs128.packet_definitions import POLARITY_EVENT
+from .latency import LatencyTracker, StampedPacket, monotonic_time
+
+
+class _DoubleBuffer(object):
+    """A pair of packet lists shared by the reader thread and the
+    dispatcher. The reader appends to one list while the dispatcher
+    sends the packets of the other, and the lists are swapped when
+    the dispatcher is done.
+    """
+
+    def __init__(self, max_packets):
+        self._max_packets = max_packets # Packets beyond this are dropped (None for no limit)
+
+        self._condition = threading.Condition()
+        self._write_buffer = []
+        self._write_buffer_events = 0
+
+        self.high_water_packets = 0
+        self.high_water_events = 0
+        self.dropped_packets = 0
+
+    def append(self, packet, number_of_events):
+        """Returns False if the packet was dropped."""
+
+        with self._condition:
+            if self._max_packets is not None and len(self._write_buffer) >= self._max_packets:
+                self.dropped_packets += 1
+                return False
+
+            self._write_buffer.append(packet)
+            self._write_buffer_events += number_of_events
+
+            self.high_water_packets = max(self.high_water_packets, len(self._write_buffer))
+            self.high_water_events = max(self.high_water_events, self._write_buffer_events)
+
+            self._condition.notify()
+
+        return True
+
+    def swap(self, read_buffer, timeout):
+        """Swap the given (emptied) read buffer with the write buffer.
+        Waits up to "timeout" seconds for packets. Returns the new read
+        buffer, which may be empty.
+        """
+
+        with self._condition:
+            if not self._write_buffer:
+                self._condition.wait(timeout)
+
+            read_buffer, self._write_buffer = self._write_buffer, read_buffer
+            self._write_buffer_events = 0
+
+        return read_buffer
 
 
 class Demux(Process):
     """A process which collects the camera's events and passes
        them to registered handler functions.
+
+       The camera configuration parameters are applied only if given
+       (otherwise libcaer's defaults are kept):
+       - usb_buffer_number: USB transfers libcaer keeps in flight.
+       - usb_buffer_size: bytes of each USB transfer.
+       - data_exchange_buffer_size: packet containers libcaer may hold
+         before dropping new ones.
+       - max_packet_size: events which complete a packet container.
+       - max_packet_interval: microseconds which complete a packet container.
+       - max_buffered_packets: packets which may be waiting for dispatch
+         before new ones are dropped (None for no limit).
     """
-    def __init__(self, handlers_queues):
+    def __init__(self, handlers_queues, data_exchange_buffer_size=None, max_packet_size=None,
+                 max_packet_interval=None, max_buffered_packets=1024, usb_buffer_number=None,
+                 usb_buffer_size=None):
         super(Demux, self).__init__()
 
         self._camera = Controller()
         self._stop_running = Event()
 
+        self._usb_buffer_number = usb_buffer_number
+        self._usb_buffer_size = usb_buffer_size
+        self._data_exchange_buffer_size = data_exchange_buffer_size
+        self._max_packet_size = max_packet_size
+        self._max_packet_interval = max_packet_interval
+        self._max_buffered_packets = max_buffered_packets
+
         # NOTE: Initially I tried to enable queue registration while
         # the demux process was actually running. It's problematic
         # since queues themselves cannot be passed between processes
@@ -39,7 +122,16 @@ class Demux(Process):
         # A list of queues held by the handlers. The camera's output
         # is sent to each of the queues.
         self._handlers_queues = handlers_queues
-        
+
+        # Records the time from acquisition until a packet was sent
+        # to all of the handlers
+        self._latency_tracker = LatencyTracker('Demux')
+
+        # Statistics of the double buffer, published by the dispatcher
+        self._high_water_packets = Value('i', 0)
+        self._high_water_events = Value('i', 0)
+        self._dropped_packets = Value('i', 0)
+
     def _init_signal_handling(self):
         # NOTE: Required in order to ignore KeyboardInterrupt
         # which may be sent to the parent process. The parent
@@ -53,6 +145,21 @@ class Demux(Process):
         self._camera.set_configuration(CAER_HOST_CONFIG_DATAEXCHANGE, \
                                        CAER_HOST_CONFIG_DATAEXCHANGE_BLOCKING, \
                                        True)
+
+        for module, parameter, value in \
+                ((CAER_HOST_CONFIG_USB, CAER_HOST_CONFIG_USB_BUFFER_NUMBER,
+                  self._usb_buffer_number),
+                 (CAER_HOST_CONFIG_USB, CAER_HOST_CONFIG_USB_BUFFER_SIZE,
+                  self._usb_buffer_size),
+                 (CAER_HOST_CONFIG_DATAEXCHANGE, CAER_HOST_CONFIG_DATAEXCHANGE_BUFFER_SIZE,
+                  self._data_exchange_buffer_size),
+                 (CAER_HOST_CONFIG_PACKETS, CAER_HOST_CONFIG_PACKETS_MAX_CONTAINER_PACKET_SIZE,
+                  self._max_packet_size),
+                 (CAER_HOST_CONFIG_PACKETS, CAER_HOST_CONFIG_PACKETS_MAX_CONTAINER_INTERVAL,
+                  self._max_packet_interval)):
+            if value is not None:
+                self._camera.set_configuration(module, parameter, value)
+
         # TODO: Added temporarily. Think about the interface to control
         # the camera configuration from outside this module. Notice that
         # we probably cannot create the camera object outside this class and pass it
@@ -67,39 +174,101 @@ class Demux(Process):
         self._camera.stop_data()
         self._camera.close_device()
 
-    def run(self):
-        self._init_signal_handling()
+    def _read_packets(self, double_buffer):
+        """The reader thread. Runs until the demux is stopped."""
 
-        # NOTE: This has to happen in the context of the CHILD process
-        # or else the data would be kept in the parent process
-        self._init_camera()
+        sequence = 0
 
         while not self._stop_running.is_set():
+            # NOTE: ctypes releases the GIL while blocking in libcaer,
+            # so the dispatcher keeps running meanwhile
             event_packet = self._camera.get_data()
             if event_packet is None:
                 continue
 
+            acquisition_time = monotonic_time()
+
             [header, packet] = event_packet.get_event_packet(POLARITY_EVENT)
             if header is None:
                 continue
 
-            events = packet.get_all_events()
+            # The events are copied so the container is freed right away
+            events = packet.get_all_events_array()
+            del header, packet, event_packet
 
+            # NOTE: The sequence advances even for dropped packets so
+            # handlers see the gap in their latency statistics
+            double_buffer.append(StampedPacket(sequence, acquisition_time, events), len(events))
+            sequence += 1
+
+    def _dispatch(self, packets):
+        for stamped_packet in packets:
             # Send all events over the queue to all registered processes
             # NOTE: The processes which hold the queues should be
             # stopped *after* the demux process stops
             for queue in self._handlers_queues:
-                queue.put_nowait(events)
+                queue.put_nowait(stamped_packet)
+
+            self._latency_tracker.record(stamped_packet)
+
+        del packets[:]
+
+    def _publish_buffer_statistics(self, double_buffer):
+        self._high_water_packets.value = double_buffer.high_water_packets
+        self._high_water_events.value = double_buffer.high_water_events
+        self._dropped_packets.value = double_buffer.dropped_packets
+
+    def run(self):
+        self._init_signal_handling()
+
+        # NOTE: This has to happen in the context of the CHILD process
+        # or else the data would be kept in the parent process
+        self._init_camera()
+
+        double_buffer = _DoubleBuffer(self._max_buffered_packets)
+
+        reader = threading.Thread(target=self._read_packets, args=(double_buffer,))
+        reader.daemon = True
+        reader.start()
+
+        packets = []
+        while not self._stop_running.is_set():
+            packets = double_buffer.swap(packets, timeout=0.1)
+            self._dispatch(packets)
+            self._publish_buffer_statistics(double_buffer)
+
+        reader.join()
+
+        # Dispatch the packets read before stopping
+        self._dispatch(double_buffer.swap(packets, timeout=0))
+        self._publish_buffer_statistics(double_buffer)
 
         self._fini_camera()
 
+        # NOTE: Inline handlers are finalized when their queue is closed
+        for queue in self._handlers_queues:
+            queue.close()
+
+    def get_latency_tracker(self):
+        return self._latency_tracker
+
+    def get_buffer_statistics(self):
+        """Get the high-water marks of the packets (and their events)
+        waiting for dispatch, and the number of packets dropped since
+        the buffer was full.
+        """
+
+        return {'high_water_packets': self._high_water_packets.value,
+                'high_water_events': self._high_water_events.value,
+                'dropped_packets': self._dropped_packets.value}
+
     def stop(self):
         self._stop_running.set()
 
 
 if __name__ == '__main__':
     import time
-    from on_off_events_counter import OnOffEventsCounter
+    from pycaer.process.on_off_events_counter import OnOffEventsCounter
 
     h = OnOffEventsCounter()
     d = Demux([h.get_events_queue()])
@@ -107,13 +276,23 @@ if __name__ == '__main__':
     h.start()
     d.start()
 
+    # The counter's snapshot is read once a second. Nothing is reset and
+    # the counter is never waited for
+    last_events_count, last_version = h.get_snapshot()
     while True:
         try:
-            print h.get_events_count()
-            h.reset_events_count()
-            time.sleep(0.01)
+            time.sleep(1)
+            events_count, version = h.get_snapshot()
+            on_events_count, off_events_count = events_count - last_events_count
+            print 'ON: {0} ev/s  OFF: {1} ev/s  ({2} packets)'.format(on_events_count,
+                                                                     off_events_count,
+                                                                     version - last_version)
+            last_events_count, last_version = events_count, version
         except KeyboardInterrupt:
             break
 
     d.stop()
     h.stop()
+
+    d.join()
+    print d.get_buffer_statistics()
@@ -12,16 +12,16 @@ TODO: Future features of this module:
 """
 
 import numpy as np
-from scipy.stats import norm
 from multiprocessing import Value, Event
 
-from .camera_events_handler import CameraEventsHandler
-from ..dvs128.process_packets import unpack_polarity_event_data
+from .camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events
 
 
 class FocusFilter(CameraEventsHandler):
-    def __init__(self, output_queue, focal_point, focus_std=10, resolution=128):
-        super(FocusFilter, self).__init__()
+    def __init__(self, output_queue, focal_point, focus_std=10, resolution=128,
+                 backend=PROCESS_BACKEND):
+        super(FocusFilter, self).__init__(backend)
 
         self._output_queue = output_queue
 
@@ -44,15 +44,14 @@ class FocusFilter(CameraEventsHandler):
 
         self._probability_matrix = np.zeros([self._resolution, self._resolution])
 
-        norm_pdfs = list()
+        # Create the distribution of the filter in a single axis. We use a mean of 0
+        # NOTE: The normal distribution is computed directly rather than with
+        # scipy.stats, whose import is slow. The scale factor of the density
+        # does not matter since it is normalized anyway
+        distances = np.arange(self._resolution * 2) - self._resolution
+        norm_pdfs = np.exp(-0.5 * (distances / float(self._focus_std)) ** 2)
 
-        # Create the distribution of the filter in a single axis
-        for i in xrange(self._resolution * 2):
-            # We use a mean of 0
-            norm_i = norm(0, self._focus_std).pdf(i - self._resolution)
-            norm_pdfs.append(norm_i)
-
-        norm_pdfs /= max(norm_pdfs) # Normalize probability so all events at the focal point are handled
+        norm_pdfs /= norm_pdfs.max() # Normalize probability so all events at the focal point are handled
 
         # Combine both axes to create a single 2D filter matrix
         for i in xrange(self._resolution):
@@ -71,40 +70,33 @@ class FocusFilter(CameraEventsHandler):
     def _create_random_number_list(self):
         # NOTE: The following is used instead of actually choosing a random value
         # for each pixel in real-time, which would be time-consuming
-        self._random_numbers = list(np.random.random(10000))
+        self._random_numbers_array = np.random.random(10000)
         self._random_numbers_index = 0
 
-    def _get_random_number(self):
-        number = self._random_numbers[self._random_numbers_index]
-        self._random_numbers_index = (self._random_numbers_index + 1) % 10000
-
-        return number
-
-    def _should_forward_event(self, data):
-        valid_mark, polarity, y, x = unpack_polarity_event_data(data)
+    def _get_random_numbers(self, count):
+        """Get the next "count" numbers of the random list, cyclically."""
 
-        if valid_mark == 0:
-            return False
+        indices = (self._random_numbers_index + np.arange(count)) % 10000
+        self._random_numbers_index = (self._random_numbers_index + count) % 10000
 
-        random_number = self._get_random_number() 
-        if random_number > self._probability_matrix[x, y]:
-            # We want to drop this event
-            return False
-        else:
-            return True
+        return self._random_numbers_array[indices]
 
     def _handle_events(self, events):
         if self._update_focal_point.is_set():
             self._build_probability_matrix()
             self._update_focal_point.clear()
 
-        forwarded_events = []
+        events = events_to_array(events)
+        valid_mark, polarity, y, x = unpack_polarity_events(events)
 
-        for data, timestamp in events:
-            if self._should_forward_event(data):
-                forwarded_events.append((data, timestamp))
+        # NOTE: An event is forwarded if it is valid and a random number
+        # does not exceed the probability of its pixel
+        valid = valid_mark == 1
+        forward = np.zeros(len(events), dtype=bool)
+        forward[valid] = self._get_random_numbers(np.count_nonzero(valid)) <= \
+                         self._probability_matrix[x[valid], y[valid]]
 
-        self._output_queue.put_nowait(forwarded_events)
+        self._put_output(self._output_queue, events[forward])
 
     def get_focal_point(self):
         return (self._focal_point_x.value, self._focal_point_y.value)
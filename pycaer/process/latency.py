@@ -0,0 +1,177 @@
+""" Module for tracing the latency of packets through the pipeline.
+
+The Demux module stamps every packet it acquires with a sequence number
+and the monotonic time of its acquisition. The stamped packet is carried
+through the handlers queues, and handlers stamp their outputs with the
+stamp of the packet they originated from.
+
+Every stage (the Demux, each handler and the Renderer) holds a latency
+tracker. The tracker keeps a histogram of the time passed since the
+acquisition of each packet the stage completed, in shared memory, so it
+may be queried from the parent process at any time. Gaps in the sequence
+numbers are counted as lost packets.
+"""
+
+import ctypes
+import json
+import math
+from collections import namedtuple
+from multiprocessing import RawArray, RawValue
+
+try:
+    from time import monotonic as monotonic_time
+except ImportError:
+    # NOTE: Python 2 has no monotonic clock in the standard library. The
+    # system's monotonic clock is shared by all processes, so acquisition
+    # times may be compared between them
+    CLOCK_MONOTONIC = 1
+
+    class _timespec(ctypes.Structure):
+        _fields_ = [("tv_sec", ctypes.c_long),
+                    ("tv_nsec", ctypes.c_long)]
+
+    # NOTE: The library is loaded by its name. Searching for it with
+    # ctypes.util.find_library runs ldconfig, which slows every import
+    _clock_gettime = ctypes.CDLL('librt.so.1').clock_gettime
+    _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+
+    def monotonic_time():
+        timespec = _timespec()
+        _clock_gettime(CLOCK_MONOTONIC, ctypes.byref(timespec))
+
+        return timespec.tv_sec + timespec.tv_nsec * 1e-9
+
+
+# A packet of the pipeline. The payload is the events (or the output of
+# a handler derived from them)
+StampedPacket = namedtuple('StampedPacket', ['sequence', 'acquisition_time', 'payload'])
+
+
+def split_stamp(item):
+    """Split an item taken from a queue into its stamp (None if the item
+    is not stamped) and payload.
+    """
+
+    if isinstance(item, StampedPacket):
+        return item, item.payload
+
+    return None, item
+
+
+class LatencyTracker(object):
+    # The histogram bins are logarithmic, starting at 1 microsecond
+    BINS_PER_DECADE = 20
+    NUMBER_OF_DECADES = 8
+    MIN_LATENCY = 1e-6
+
+    def __init__(self, name):
+        self._name = name
+
+        self._number_of_bins = self.BINS_PER_DECADE * self.NUMBER_OF_DECADES
+
+        # NOTE: Every tracker has a single writer (the stage process) so no
+        # locks are used. Readers might see a packet partially recorded
+        self._histogram = RawArray('L', self._number_of_bins)
+        self._max_latency = RawValue('d', 0)
+
+        self._last_sequence = RawValue(ctypes.c_int64, -1)
+        self._lost_packets = RawValue('L', 0)
+        self._number_of_gaps = RawValue('L', 0)
+        # The sequence numbers of the packets around the last gap
+        self._last_gap = RawArray(ctypes.c_int64, 2)
+
+    def get_name(self):
+        return self._name
+
+    def _get_bin(self, latency):
+        if latency <= self.MIN_LATENCY:
+            return 0
+
+        index = int(math.log10(latency / self.MIN_LATENCY) * self.BINS_PER_DECADE)
+
+        return min(index, self._number_of_bins - 1)
+
+    def _get_bin_upper_edge(self, index):
+        return self.MIN_LATENCY * 10 ** (float(index + 1) / self.BINS_PER_DECADE)
+
+    def record(self, stamp, now=None):
+        """Record the completion of a stamped packet by the stage."""
+
+        if now is None:
+            now = monotonic_time()
+
+        latency = now - stamp.acquisition_time
+
+        self._histogram[self._get_bin(latency)] += 1
+        if latency > self._max_latency.value:
+            self._max_latency.value = latency
+
+        last_sequence = self._last_sequence.value
+        if last_sequence >= 0 and stamp.sequence > last_sequence + 1:
+            self._lost_packets.value += stamp.sequence - last_sequence - 1
+            self._number_of_gaps.value += 1
+            self._last_gap[0] = last_sequence
+            self._last_gap[1] = stamp.sequence
+        self._last_sequence.value = max(last_sequence, stamp.sequence)
+
+    def get_histogram(self):
+        """Get a list of (bin upper edge, count) pairs of the non-empty
+        bins. Latencies are in seconds.
+        """
+
+        return [(self._get_bin_upper_edge(index), count)
+                for index, count in enumerate(self._histogram) if count > 0]
+
+    def _get_percentile(self, histogram, count, percentile, max_latency):
+        threshold = count * percentile / 100.0
+
+        accumulated = 0
+        for upper_edge, bin_count in histogram:
+            accumulated += bin_count
+            if accumulated >= threshold:
+                # NOTE: No latency is above the maximum, which may be
+                # lower than the upper edge of its bin
+                return min(upper_edge, max_latency)
+
+        return None
+
+    def get_statistics(self):
+        """Get a dictionary of the latency statistics of the stage.
+
+        Percentiles are the upper edge of the histogram bin they fall in,
+        but not above the maximum latency. Latencies are in seconds and are None if no packet was recorded.
+        """
+
+        histogram = self.get_histogram()
+        count = sum(bin_count for _, bin_count in histogram)
+        max_latency = self._max_latency.value if count > 0 else None
+
+        return {'name': self._name,
+                'count': count,
+                'p50': self._get_percentile(histogram, count, 50, max_latency),
+                'p99': self._get_percentile(histogram, count, 99, max_latency),
+                'max': max_latency,
+                'last_sequence': self._last_sequence.value,
+                'lost_packets': self._lost_packets.value,
+                'gaps': self._number_of_gaps.value,
+                'last_gap': tuple(self._last_gap) if self._number_of_gaps.value > 0 else None}
+
+    def reset(self):
+        for index in xrange(self._number_of_bins):
+            self._histogram[index] = 0
+        self._max_latency.value = 0
+        self._lost_packets.value = 0
+        self._number_of_gaps.value = 0
+
+
+def export_statistics(trackers, path):
+    """Export the statistics and histograms of several trackers to a JSON file."""
+
+    report = []
+    for tracker in trackers:
+        statistics = tracker.get_statistics()
+        statistics['histogram'] = tracker.get_histogram()
+        report.append(statistics)
+
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
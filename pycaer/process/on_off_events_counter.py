@@ -1,36 +1,42 @@
 """ Module implementing an ON/OFF events counter.
+
+The counts are published as a snapshot after every packet (see the
+snapshot module), so the parent process reads them without locks.
 """
 
-from multiprocessing import Value
+import numpy as np
 
-from .camera_events_handler import CameraEventsHandler
-from ..dvs128.process_packets import unpack_polarity_event_data
+from .camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events
 
 
 class OnOffEventsCounter(CameraEventsHandler):
-    def __init__(self):
-        super(OnOffEventsCounter, self).__init__()
+    def __init__(self, backend=PROCESS_BACKEND):
+        super(OnOffEventsCounter, self).__init__(backend)
 
-        self._on_events_count = Value('i', 0)
-        self._off_events_count = Value('i', 0)
+        # The total (ON, OFF) counts since the handler was created. Only the
+        # handler writes them, so resetting is done by the reader keeping
+        # the counts at the time of the reset
+        self._events_count = np.zeros(2, dtype=np.int64)
+        self._init_snapshot(2, np.int64)
+        self._reset_events_count = np.zeros(2, dtype=np.int64)
 
     def _handle_events(self, events):
-        for data, timestamp in events:
-            valid_mark, polarity, _, _ = unpack_polarity_event_data(data)
+        valid_mark, polarity, _, _ = unpack_polarity_events(events_to_array(events))
+
+        valid = valid_mark == 1
+        on_events_count = np.count_nonzero(polarity[valid] == 1)
 
-            if valid_mark == 0:
-                continue
+        self._events_count[0] += on_events_count
+        self._events_count[1] += np.count_nonzero(valid) - on_events_count
 
-            if polarity == 1:
-                # ON
-                self._on_events_count.value += 1 
-            else:
-                # OFF
-                self._off_events_count.value += 1 
+        self._publish_snapshot(self._events_count)
 
     def get_events_count(self):
-        return (self._on_events_count.value, self._off_events_count.value)
+        events_count, _ = self.get_snapshot()
+        on_events_count, off_events_count = events_count - self._reset_events_count
+
+        return (int(on_events_count), int(off_events_count))
 
     def reset_events_count(self):
-        self._on_events_count.value = 0
-        self._off_events_count.value = 0
+        self._reset_events_count, _ = self.get_snapshot()
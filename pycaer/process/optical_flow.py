@@ -0,0 +1,198 @@
+""" Module implementing an event-based optical flow estimator.
+
+The estimator computes the normal flow of every event by fitting a
+local plane to the timestamps of its neighbourhood in the timestamp
+surface (the "local plane fitting" method of Benosman et al.). The
+gradient of the plane is the inverse of the speed of the moving edge.
+
+The whole batch of events is processed at once: the neighbourhoods
+are gathered into a single array and the planes are solved in closed
+form, without a Python loop over the events.
+
+Each batch results in a tuple (flow, regions) sent to the output queue:
+- "flow" is an (N, 5) array of (x, y, timestamp, vx, vy) rows, one per
+  event with a valid estimate. Velocities are in pixels per second.
+- "regions" is a (rows, columns, 3) array of (vx, vy, count) holding
+  the mean flow of each region of the field of view, or None if no
+  region size was requested.
+
+The regions of the latest batch are also published as a snapshot (see
+the snapshot module), so the parent process may read the flow map at any
+time without draining the output queue (see "get_regions").
+"""
+
+import numpy as np
+
+from .camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from .timestamp_surface import TimestampSurface
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events, \
+                                      TIMESTAMPS_PER_SECOND
+
+
+class OpticalFlow(CameraEventsHandler):
+    def __init__(self, output_queue, radius=2, time_window=50000, min_neighbours=6,
+                 region_size=None, resolution=128, backend=PROCESS_BACKEND):
+        super(OpticalFlow, self).__init__(backend)
+
+        self._output_queue = output_queue
+
+        self._radius = radius # Neighbourhood used for fitting is (2 * radius + 1) pixels square
+        self._time_window = time_window # Only neighbours this recent (in microseconds) are used
+        self._min_neighbours = min_neighbours # Minimal number of neighbours for a valid fit
+        self._region_size = region_size # Size in pixels of the regions of the summary (None to disable)
+        self._resolution = resolution
+
+        # Separate surfaces are kept for ON and OFF events since an edge
+        # of a single polarity is what forms a plane
+        self._surface = TimestampSurface(resolution, padding=radius, polarities=2)
+
+        if region_size is not None:
+            regions_per_row = -(-resolution // region_size)
+            self._init_snapshot((regions_per_row, regions_per_row, 3), np.float64)
+
+        offsets = np.arange(-radius, radius + 1)
+        self._offsets_x = np.repeat(offsets, len(offsets))
+        self._offsets_y = np.tile(offsets, len(offsets))
+
+    def _fit_planes(self, x, y, timestamps, polarity):
+        """Fit a plane t = a * dx + b * dy + c to the neighbourhood of
+        each event and return the gradients (a, b) and a validity mask.
+        """
+
+        offsets_x = self._offsets_x.astype(np.float64)
+        offsets_y = self._offsets_y.astype(np.float64)
+
+        neighbours = self._surface.gather(x, y, self._offsets_x, self._offsets_y, polarity)
+        dt = neighbours - timestamps[:, np.newaxis]
+
+        # NOTE: Events later in the batch are already on the surface. They
+        # are in the future relative to the event and are excluded
+        weights = ((dt <= 0) & (dt > -self._time_window)).astype(np.float64)
+        dt = dt * weights
+
+        # Sums of the normal equations of the least squares problem
+        n = weights.sum(axis=1)
+        sx = weights.dot(offsets_x)
+        sy = weights.dot(offsets_y)
+        sxx = weights.dot(offsets_x * offsets_x)
+        syy = weights.dot(offsets_y * offsets_y)
+        sxy = weights.dot(offsets_x * offsets_y)
+        st = dt.sum(axis=1)
+        sxt = dt.dot(offsets_x)
+        syt = dt.dot(offsets_y)
+
+        # Eliminating the constant term leaves a 2x2 system per event
+        n_safe = np.maximum(n, 1)
+        cxx = sxx - sx * sx / n_safe
+        cyy = syy - sy * sy / n_safe
+        cxy = sxy - sx * sy / n_safe
+        cxt = sxt - sx * st / n_safe
+        cyt = syt - sy * st / n_safe
+
+        det = cxx * cyy - cxy * cxy
+        valid = (n >= self._min_neighbours) & (det > 1e-6)
+        det[~valid] = 1
+
+        a = (cyy * cxt - cxy * cyt) / det
+        b = (cxx * cyt - cxy * cxt) / det
+
+        return a, b, valid & (a * a + b * b > 1e-12)
+
+    def _summarize_regions(self, flow):
+        regions_per_row = -(-self._resolution // self._region_size)
+        number_of_regions = regions_per_row * regions_per_row
+
+        region = (flow[:, 0].astype(np.intp) // self._region_size) * regions_per_row + \
+                 flow[:, 1].astype(np.intp) // self._region_size
+
+        count = np.bincount(region, minlength=number_of_regions).astype(np.float64)
+        vx = np.bincount(region, weights=flow[:, 3], minlength=number_of_regions)
+        vy = np.bincount(region, weights=flow[:, 4], minlength=number_of_regions)
+
+        summary = np.empty((number_of_regions, 3))
+        summary[:, 0] = vx / np.maximum(count, 1)
+        summary[:, 1] = vy / np.maximum(count, 1)
+        summary[:, 2] = count
+
+        return summary.reshape(regions_per_row, regions_per_row, 3)
+
+    def compute_flow(self, events):
+        """Update the timestamp surface with a batch of events and
+        return their flow array as described in the module.
+        """
+
+        events = events_to_array(events)
+        valid_mark, polarity, y, x = unpack_polarity_events(events)
+
+        valid = valid_mark == 1
+        x = x[valid]
+        y = y[valid]
+        polarity = polarity[valid]
+        timestamps = events[valid, 1].astype(np.int64)
+
+        self._surface.update(x, y, timestamps, polarity)
+
+        a, b, fitted = self._fit_planes(x, y, timestamps, polarity)
+
+        # The plane gradient points in the direction of motion and its
+        # norm is the inverse of the speed
+        a = a[fitted]
+        b = b[fitted]
+        squared_norm = a * a + b * b
+
+        flow = np.empty((len(a), 5))
+        flow[:, 0] = x[fitted]
+        flow[:, 1] = y[fitted]
+        flow[:, 2] = timestamps[fitted]
+        flow[:, 3] = a / squared_norm * TIMESTAMPS_PER_SECOND
+        flow[:, 4] = b / squared_norm * TIMESTAMPS_PER_SECOND
+
+        return flow
+
+    def _handle_events(self, events):
+        flow = self.compute_flow(events)
+
+        regions = None
+        if self._region_size is not None:
+            regions = self._summarize_regions(flow)
+            self._publish_snapshot(regions)
+
+        self._put_output(self._output_queue, (flow, regions))
+
+    def get_regions(self):
+        """Get the regions array of the latest batch (see the module).
+        Available only if a region size was given.
+        """
+
+        if self._region_size is None:
+            raise ValueError('OpticalFlow was created without a region size')
+
+        regions, _ = self.get_snapshot()
+
+        return regions
+
+
+if __name__ == '__main__':
+    from multiprocessing import Queue
+    from Queue import Empty
+    from pycaer.process.demux import Demux
+    from pycaer.process.latency import split_stamp
+
+    flow_queue = Queue()
+    optical_flow = OpticalFlow(flow_queue, region_size=32)
+    demux = Demux([optical_flow.get_events_queue()])
+
+    optical_flow.start()
+    demux.start()
+
+    while True:
+        try:
+            _, (flow, regions) = split_stamp(flow_queue.get(timeout=0.1))
+            print np.round(regions[:, :, :2]).astype(int).tolist()
+        except Empty:
+            continue
+        except KeyboardInterrupt:
+            break
+
+    demux.stop()
+    optical_flow.stop()
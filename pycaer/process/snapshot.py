@@ -0,0 +1,72 @@
+""" Module implementing shared-memory snapshots of the state of a stage.
+
+A snapshot holds the latest state published by a stage (for example, a
+handler's counters or cluster list, or the Renderer's frame) as an array
+of a fixed shape and type in shared memory. The parent process, or a
+monitoring thread, may read a consistent copy of it at any time without
+locks and without sending messages to the stage.
+
+Consistency is kept by a sequence lock (seqlock). The single writer
+makes the sequence number odd while it writes and even again when done.
+A reader copies the buffer and retries if the sequence number was odd
+or changed meanwhile. Writers never wait for readers.
+"""
+
+import ctypes
+import time
+from multiprocessing import RawArray, RawValue
+
+import numpy as np
+
+
+class Snapshot(object):
+    def __init__(self, shape, dtype=np.float64):
+        self._shape = tuple(np.atleast_1d(shape))
+        self._dtype = np.dtype(dtype)
+
+        size = int(np.prod(self._shape)) * self._dtype.itemsize
+        self._buffer = RawArray(ctypes.c_uint8, max(size, 1))
+
+        # NOTE: Every snapshot has a single writer (the stage process). The
+        # sequence number is even while the buffer is consistent
+        self._sequence = RawValue(ctypes.c_int64, 0)
+
+    def _get_array(self):
+        return np.frombuffer(self._buffer, dtype=self._dtype,
+                             count=int(np.prod(self._shape))).reshape(self._shape)
+
+    def publish(self, state):
+        """Copy a state (an array of the snapshot's shape) to the snapshot.
+        Must be called by a single writer.
+        """
+
+        self._sequence.value += 1
+        self._get_array()[...] = state
+        self._sequence.value += 1
+
+    def read(self):
+        """Get a consistent copy of the latest state and its version (the
+        number of times it was published). Never blocks the writer.
+        """
+
+        array = self._get_array()
+
+        while True:
+            sequence = self._sequence.value
+            if sequence % 2 == 1:
+                # NOTE: The writer is in the middle of publishing. Publishing
+                # is a single copy, so it is done soon
+                time.sleep(0)
+                continue
+
+            state = array.copy()
+
+            if self._sequence.value == sequence:
+                return state, sequence // 2
+
+    def get_version(self):
+        """Get the number of times a state was published, to tell whether
+        a new one was published without copying it.
+        """
+
+        return self._sequence.value // 2
@@ -0,0 +1,145 @@
+""" Module for generating synthetic camera events.
+
+Used for benchmarking handlers without a camera. The generated packets
+have the same format as the ones sent by the Demux module, only held
+in arrays rather than in lists.
+"""
+
+import numpy as np
+
+from ..dvs128.process_packets import pack_polarity_events, TIMESTAMPS_PER_SECOND
+from .latency import StampedPacket, monotonic_time
+
+
+def split_to_packets(events, packet_size=4096):
+    """Split an (N, 2) events array into packets the size of a camera packet."""
+
+    return [events[i:i + packet_size] for i in xrange(0, len(events), packet_size)]
+
+def put_packets(events_queue, packets):
+    """Put packets in a handler's events queue, stamped at the time they
+    are put as the Demux module stamps the packets it acquires.
+    """
+
+    for sequence, packet in enumerate(packets):
+        events_queue.put_nowait(StampedPacket(sequence, monotonic_time(), packet))
+
+def moving_edge(duration, rate, speed, noise=0.05, resolution=128, seed=0):
+    """Generate the events of a vertical edge sweeping the field of view
+    along the x axis.
+
+    "duration" is in seconds, "rate" in events per second and "speed"
+    in pixels per second. A fraction "noise" of the events is spread
+    uniformly over the field of view.
+    """
+
+    random = np.random.RandomState(seed)
+
+    number_of_events = int(duration * rate)
+    timestamps = np.sort(random.randint(0, int(duration * TIMESTAMPS_PER_SECOND),
+                                        number_of_events))
+
+    x = (timestamps * speed / TIMESTAMPS_PER_SECOND).astype(np.int64) % resolution
+    y = random.randint(0, resolution, number_of_events)
+
+    is_noise = random.random_sample(number_of_events) < noise
+    x[is_noise] = random.randint(0, resolution, is_noise.sum())
+
+    polarity = np.ones(number_of_events, dtype=np.int32)
+
+    return pack_polarity_events(x, y, polarity, timestamps)
+
+def _reflect(position, resolution):
+    """Fold positions into [0, resolution) as if bouncing off the edges."""
+
+    period = 2 * (resolution - 1)
+    position = np.mod(position, period)
+
+    return np.where(position < resolution, position, period - position)
+
+def moving_blobs(duration, rate, blobs, sigma=2.0, noise=0.05, resolution=128, seed=0):
+    """Generate the events of round blobs moving across the field of view
+    and bouncing off its edges.
+
+    "blobs" is a list of (x, y, vx, vy) tuples of the initial position (in
+    pixels) and velocity (in pixels per second) of each blob. Events are
+    spread evenly between the blobs, normally distributed around their
+    centers. Returns the events and a function which gives the (B, 2)
+    centers of the blobs at a given timestamp.
+    """
+
+    random = np.random.RandomState(seed)
+    blobs = np.asarray(blobs, dtype=np.float64)
+
+    def get_centers(timestamp):
+        seconds = float(timestamp) / TIMESTAMPS_PER_SECOND
+        return _reflect(blobs[:, :2] + blobs[:, 2:] * seconds, resolution)
+
+    number_of_events = int(duration * rate)
+    timestamps = np.sort(random.randint(0, int(duration * TIMESTAMPS_PER_SECOND),
+                                        number_of_events))
+    seconds = timestamps / float(TIMESTAMPS_PER_SECOND)
+
+    blob = random.randint(0, len(blobs), number_of_events)
+    centers = _reflect(blobs[blob, :2] + blobs[blob, 2:] * seconds[:, np.newaxis], resolution)
+    positions = centers + random.normal(0, sigma, (number_of_events, 2))
+
+    is_noise = random.random_sample(number_of_events) < noise
+    positions[is_noise] = random.uniform(0, resolution, (is_noise.sum(), 2))
+
+    positions = np.clip(np.round(positions), 0, resolution - 1).astype(np.int64)
+    polarity = random.randint(0, 2, number_of_events)
+
+    return pack_polarity_events(positions[:, 0], positions[:, 1], polarity, timestamps), get_centers
+
+def moving_square(duration, rate, velocity, size=32, noise=0.05, resolution=128, seed=0):
+    """Generate the events of the outline of a square moving across the
+    field of view and bouncing off its edges.
+
+    "velocity" is a (vx, vy) tuple in pixels per second. Events are spread
+    evenly along the outline. Sides moving forward produce ON events and
+    sides moving backward produce OFF events. Returns the events and a
+    function which gives the (4, 2) corners of the square at a given
+    timestamp.
+    """
+
+    random = np.random.RandomState(seed)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    start = np.array([(resolution - size) / 2.0] * 2)
+
+    # Unit offsets of the corners, counterclockwise from the lower left
+    corner_offsets = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float64) * size
+    # Outward normals of the sides following each corner
+    side_normals = np.array([[0, -1], [1, 0], [0, 1], [-1, 0]], dtype=np.float64)
+
+    def get_corners(timestamp):
+        seconds = float(timestamp) / TIMESTAMPS_PER_SECOND
+        return _reflect(start + velocity * seconds, resolution - size) + corner_offsets
+
+    number_of_events = int(duration * rate)
+    timestamps = np.sort(random.randint(0, int(duration * TIMESTAMPS_PER_SECOND),
+                                        number_of_events))
+    seconds = timestamps / float(TIMESTAMPS_PER_SECOND)
+
+    origins = _reflect(start + velocity * seconds[:, np.newaxis], resolution - size)
+
+    # A position along the outline, in sides
+    outline = random.uniform(0, 4, number_of_events)
+    side = outline.astype(np.intp)
+    fraction = (outline - side)[:, np.newaxis]
+    positions = origins + corner_offsets[side] + \
+                fraction * (corner_offsets[(side + 1) % 4] - corner_offsets[side])
+
+    # NOTE: The direction of motion flips on every bounce, so the
+    # polarities follow the reflected velocity
+    previous_origins = _reflect(start + velocity * (seconds[:, np.newaxis] - 1e-3),
+                                resolution - size)
+    motion = origins - previous_origins
+    polarity = ((side_normals[side] * motion).sum(axis=1) > 0).astype(np.int32)
+
+    is_noise = random.random_sample(number_of_events) < noise
+    positions[is_noise] = random.uniform(0, resolution, (is_noise.sum(), 2))
+
+    positions = np.clip(np.round(positions), 0, resolution - 1).astype(np.int64)
+
+    return pack_polarity_events(positions[:, 0], positions[:, 1], polarity, timestamps), get_corners
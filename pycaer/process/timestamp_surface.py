@@ -0,0 +1,71 @@
+""" Module implementing a per-pixel timestamp surface (also known as
+the "surface of active events").
+
+The surface holds the timestamp of the latest event of every pixel.
+Handlers which need the local history of the event stream (for example,
+optical flow estimation) use it to gather the neighbourhood of a whole
+batch of events at once instead of iterating over the events.
+"""
+
+import numpy as np
+
+
+# Timestamp of pixels which have not received any event yet. It is far
+# enough in the past to fail any time window test, while still leaving
+# room for subtraction without overflowing
+NO_EVENT = -(2 ** 62)
+
+
+class TimestampSurface(object):
+    def __init__(self, resolution=128, padding=0, polarities=1):
+        self._resolution = resolution
+        # NOTE: The surface is padded on all sides so neighbourhoods of
+        # pixels at the edges may be gathered without bounds checking.
+        # Padding pixels never receive events
+        self._padding = padding
+        self._polarities = polarities
+
+        size = resolution + 2 * padding
+        self._surface = np.empty((polarities, size, size), dtype=np.int64)
+
+        self.reset()
+
+    def reset(self):
+        self._surface.fill(NO_EVENT)
+
+    def _polarity_index(self, polarity, length):
+        if self._polarities == 1 or polarity is None:
+            return np.zeros(length, dtype=np.intp)
+
+        return polarity
+
+    def update(self, x, y, timestamps, polarity=None):
+        """Set the timestamps of the given pixels. All arguments are
+        arrays of the same length.
+        """
+
+        p = self._polarity_index(polarity, len(x))
+
+        # NOTE: When a pixel appears more than once numpy keeps the last
+        # assignment which, since events arrive in time order, is the latest
+        self._surface[p, x + self._padding, y + self._padding] = timestamps
+
+    def gather(self, x, y, offsets_x, offsets_y, polarity=None):
+        """Get the timestamps of the neighbourhood of each pixel.
+
+        Returns an (N, K) array where N is the number of pixels and
+        K is the number of (offsets_x, offsets_y) pairs.
+        """
+
+        p = self._polarity_index(polarity, len(x))
+
+        return self._surface[p[:, np.newaxis],
+                             (x + self._padding)[:, np.newaxis] + offsets_x,
+                             (y + self._padding)[:, np.newaxis] + offsets_y]
+
+    def get_surface(self):
+        """Get a copy of the surface without the padding."""
+
+        end = self._padding + self._resolution
+
+        return self._surface[:, self._padding:end, self._padding:end].copy()
@@ -0,0 +1,209 @@
+""" Module for processing recordings offline with the events handlers.
+
+The recording is split into time chunks which are processed in parallel
+by a pool of processes. The handlers are not started as processes of
+their own. Instead, they are created with the inline backend, so putting
+the recorded packets in their queue calls their handler function
+directly, and their outputs are collected.
+
+Handlers keep state between packets (for example, a timestamp surface)
+so each chunk first processes a warm-up period preceding it. The outputs
+of the warm-up period are discarded.
+
+Each stage describes how to create a handler, collect the results of a
+chunk and merge the results of all chunks into the output file.
+"""
+
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from .recorder import RecordingWriter
+from .recording_reader import RecordingReader
+from ..process.camera_events_handler import INLINE_BACKEND
+from ..dvs128.process_packets import TIMESTAMPS_PER_SECOND
+
+
+class CollectingQueue(object):
+    """Stands for the output queue of a handler run offline."""
+
+    def __init__(self):
+        self.items = []
+
+    def put_nowait(self, item):
+        self.items.append(item)
+
+    put = put_nowait
+
+
+class FocusFilterStage(object):
+    """Filters the events. The output is a recording of the forwarded events."""
+
+    def __init__(self, focal_point=(64, 64), focus_std=10):
+        self._focal_point = focal_point
+        self._focus_std = focus_std
+
+    def create_handler(self, output_queue):
+        # NOTE: Handlers are imported only by the stage using them so
+        # the dependencies of the other handlers are not loaded
+        from ..process.focus_filter import FocusFilter
+
+        return FocusFilter(output_queue, self._focal_point, self._focus_std,
+                           backend=INLINE_BACKEND)
+
+    def discard_warm_up(self, handler, output_queue):
+        del output_queue.items[:]
+
+    def collect(self, handler, output_queue, part_path):
+        with RecordingWriter(part_path) as writer:
+            for events in output_queue.items:
+                writer.write(events)
+
+        return part_path
+
+    def merge(self, results, output_path):
+        with RecordingWriter(output_path) as writer:
+            for part_path in results:
+                with RecordingReader(part_path) as reader:
+                    for events in reader.iter_packets():
+                        writer.write(events)
+                os.remove(part_path)
+
+
+class OnOffEventsCounterStage(object):
+    """Counts the ON and OFF events. The output is a JSON file of the total
+    counts and the counts of each chunk.
+    """
+
+    def create_handler(self, output_queue):
+        from ..process.on_off_events_counter import OnOffEventsCounter
+
+        return OnOffEventsCounter(backend=INLINE_BACKEND)
+
+    def discard_warm_up(self, handler, output_queue):
+        handler.reset_events_count()
+
+    def collect(self, handler, output_queue, part_path):
+        return handler.get_events_count()
+
+    def merge(self, results, output_path):
+        with open(output_path, 'w') as f:
+            json.dump({'on': sum(on for on, off in results),
+                       'off': sum(off for on, off in results),
+                       'chunks': results}, f)
+
+
+class OpticalFlowStage(object):
+    """Estimates the optical flow. The output is a .npy file of the
+    (x, y, timestamp, vx, vy) rows of all the events.
+    """
+
+    def create_handler(self, output_queue):
+        from ..process.optical_flow import OpticalFlow
+
+        return OpticalFlow(output_queue, backend=INLINE_BACKEND)
+
+    def discard_warm_up(self, handler, output_queue):
+        del output_queue.items[:]
+
+    def collect(self, handler, output_queue, part_path):
+        flows = [flow for flow, regions in output_queue.items]
+        np.save(part_path, np.concatenate(flows) if flows else np.empty((0, 5)))
+
+        # NOTE: np.save adds the extension
+        return part_path + '.npy'
+
+    def merge(self, results, output_path):
+        parts = [np.load(part_path, mmap_mode='r') for part_path in results]
+
+        # The output is preallocated so the parts are never all in memory
+        output = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float64,
+                                           shape=(sum(len(part) for part in parts), 5))
+        offset = 0
+        for part in parts:
+            output[offset:offset + len(part)] = part
+            offset += len(part)
+        output.flush()
+
+        del parts
+        for part_path in results:
+            os.remove(part_path)
+
+
+STAGES = {'focus-filter': FocusFilterStage,
+          'on-off-counter': OnOffEventsCounterStage,
+          'optical-flow': OpticalFlowStage}
+
+
+def _process_chunk(args):
+    """Process a single chunk in a pool process. Returns the result of
+    the chunk and the number of events processed (excluding warm-up).
+    """
+
+    recording_path, stage, start_time, end_time, warm_up, packet_duration, part_path = args
+
+    output_queue = CollectingQueue()
+    handler = stage.create_handler(output_queue)
+    events_queue = handler.get_events_queue()
+
+    with RecordingReader(recording_path) as reader:
+        if warm_up > 0:
+            for events in reader.iter_packets(max(0, start_time - warm_up), start_time,
+                                              packet_duration):
+                events_queue.put_nowait(events)
+            stage.discard_warm_up(handler, output_queue)
+
+        number_of_events = 0
+        for events in reader.iter_packets(start_time, end_time, packet_duration):
+            events_queue.put_nowait(events)
+            number_of_events += len(events)
+
+    events_queue.close()
+
+    return stage.collect(handler, output_queue, part_path), number_of_events
+
+def process_recording(recording_path, output_path, stage, chunk_duration=10 * TIMESTAMPS_PER_SECOND,
+                      warm_up=100000, packet_duration=10000, processes=None):
+    """Process a recording with the given stage and write the merged
+    results to the output path. Durations are in microseconds.
+
+    Returns a dictionary of throughput statistics.
+    """
+
+    with RecordingReader(recording_path) as reader:
+        start_time = reader.get_start_time()
+        end_time = reader.get_end_time()
+
+    if start_time is None:
+        start_time = end_time = 0
+
+    chunks = [(recording_path, stage, chunk_start, min(chunk_start + chunk_duration, end_time),
+               warm_up, packet_duration, '{0}.part{1:05d}'.format(output_path, i))
+              for i, chunk_start in enumerate(xrange(int(start_time), int(end_time),
+                                                     int(chunk_duration)))]
+
+    processing_start_time = time.time()
+
+    pool = Pool(processes)
+    try:
+        # NOTE: imap keeps the order of the chunks for merging
+        chunk_results = list(pool.imap(_process_chunk, chunks))
+    finally:
+        pool.close()
+        pool.join()
+
+    results = [result for result, _ in chunk_results]
+    stage.merge(results, output_path)
+
+    elapsed_time = time.time() - processing_start_time
+    number_of_events = sum(number_of_events for _, number_of_events in chunk_results)
+    recording_duration = float(end_time - start_time) / TIMESTAMPS_PER_SECOND
+
+    return {'chunks': len(chunks),
+            'events': number_of_events,
+            'elapsed_time': elapsed_time,
+            'events_per_second': number_of_events / elapsed_time,
+            'real_time_factor': recording_duration / elapsed_time}
@@ -0,0 +1,283 @@
+""" Module for exporting events as fixed-shape tensors for training models.
+
+The events are split into samples of a fixed duration. Each sample is
+converted into a (bins, 2, 128, 128) float32 tensor of one of the
+following representations:
+- "counts": the number of events of each polarity at each pixel in each
+  of the time bins of the sample.
+- "voxel": a voxel grid. Every event is split between its two nearest
+  time bins in proportion to its distance from them.
+
+The tensors are written into preallocated shards, .npy files of a fixed
+number of samples which may be opened with np.load(mmap_mode='r'). The
+index file (index.json) lists the shards and, for every sample, its
+shard, row, time range and number of events.
+
+Recordings are exported in parallel, a shard per task. A live stream is
+exported by the DatasetExporter events handler. In both cases only a
+single sample's events are held in memory at a time.
+"""
+
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from .recorder import TimestampUnwrapper
+from .recording_reader import RecordingReader
+from ..process.camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events
+
+REPRESENTATIONS = ('counts', 'voxel')
+
+TENSOR_DTYPE = np.float32
+
+INDEX_FILE_NAME = 'index.json'
+
+
+def events_to_tensor(events, start_time, sample_duration, bins, representation, resolution=128):
+    """Convert the events of a single sample to a (bins, 2, resolution,
+    resolution) tensor. "start_time" is the start of the sample.
+    """
+
+    valid_mark, polarity, y, x = unpack_polarity_events(events)
+    valid = valid_mark == 1
+
+    polarity = polarity[valid].astype(np.intp)
+    x = x[valid].astype(np.intp)
+    y = y[valid].astype(np.intp)
+    # The time of each event in bin units, in [0, bins)
+    time_bins = (events[valid, 1] - start_time) * (float(bins) / sample_duration)
+
+    size = bins * 2 * resolution * resolution
+    pixel_index = (polarity * resolution + x) * resolution + y
+
+    if representation == 'counts':
+        bin_index = np.clip(time_bins.astype(np.intp), 0, bins - 1)
+        tensor = np.bincount(bin_index * (2 * resolution * resolution) + pixel_index,
+                             minlength=size)
+    else:
+        # NOTE: The bins are centered at integer positions, so an event
+        # between bin centers i and i + 1 is split between both
+        position = np.clip(time_bins - 0.5, 0, bins - 1)
+        lower_bin = np.minimum(position.astype(np.intp), bins - 1)
+        upper_bin = np.minimum(lower_bin + 1, bins - 1)
+        upper_weight = position - lower_bin
+
+        tensor = np.bincount(lower_bin * (2 * resolution * resolution) + pixel_index,
+                             weights=1 - upper_weight, minlength=size) + \
+                 np.bincount(upper_bin * (2 * resolution * resolution) + pixel_index,
+                             weights=upper_weight, minlength=size)
+
+    return tensor.astype(TENSOR_DTYPE).reshape(bins, 2, resolution, resolution)
+
+def _get_shard_path(directory, shard):
+    return os.path.join(directory, 'shard_{0:05d}.npy'.format(shard))
+
+def _create_shard(path, samples, bins, resolution):
+    shard = np.lib.format.open_memmap(path, mode='w+', dtype=TENSOR_DTYPE,
+                                      shape=(samples, bins, 2, resolution, resolution))
+    del shard
+
+def _write_index(directory, representation, bins, sample_duration, resolution,
+                 shard_sizes, samples):
+    index = {'representation': representation,
+             'sample_shape': [bins, 2, resolution, resolution],
+             'dtype': np.dtype(TENSOR_DTYPE).name,
+             'sample_duration': sample_duration,
+             'shards': [{'path': os.path.basename(_get_shard_path(directory, shard)),
+                         'samples': size}
+                        for shard, size in enumerate(shard_sizes)],
+             # Rows of (shard, row, start_time, end_time, number_of_events)
+             'samples': samples}
+
+    with open(os.path.join(directory, INDEX_FILE_NAME), 'w') as f:
+        json.dump(index, f)
+
+def _export_shard(args):
+    """Export the samples of a single shard in a pool process. Returns
+    the index rows of the shard's samples.
+    """
+
+    (recording_path, shard_path, shard, first_sample_time, number_of_samples,
+     sample_duration, bins, representation, resolution) = args
+
+    shard_array = np.load(shard_path, mmap_mode='r+')
+    samples = []
+
+    with RecordingReader(recording_path) as reader:
+        for row in xrange(number_of_samples):
+            start_time = first_sample_time + row * sample_duration
+            events = reader.read(start_time, start_time + sample_duration)
+
+            shard_array[row] = events_to_tensor(events, start_time, sample_duration, bins,
+                                                representation, resolution)
+            samples.append([shard, row, start_time, start_time + sample_duration, len(events)])
+
+    shard_array.flush()
+    del shard_array
+
+    return samples
+
+def export_recording(recording_path, directory, representation='voxel', bins=5,
+                     sample_duration=50000, samples_per_shard=128, processes=None,
+                     resolution=128):
+    """Export a recording to a directory of shards. Durations are in
+    microseconds. Returns the number of samples exported.
+    """
+
+    if representation not in REPRESENTATIONS:
+        raise ValueError('Unknown representation {0}'.format(representation))
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    with RecordingReader(recording_path) as reader:
+        start_time = reader.get_start_time()
+        end_time = reader.get_end_time()
+
+    number_of_samples = 0
+    if start_time is not None:
+        number_of_samples = int((end_time - start_time) // sample_duration)
+
+    # All the shards are preallocated up front so the tasks only fill them
+    tasks = []
+    shard_sizes = []
+    for shard, first_sample in enumerate(xrange(0, number_of_samples, samples_per_shard)):
+        size = min(samples_per_shard, number_of_samples - first_sample)
+        shard_path = _get_shard_path(directory, shard)
+        _create_shard(shard_path, size, bins, resolution)
+
+        shard_sizes.append(size)
+        tasks.append((recording_path, shard_path, shard,
+                      int(start_time + first_sample * sample_duration), size,
+                      sample_duration, bins, representation, resolution))
+
+    pool = Pool(processes)
+    try:
+        samples = [sample for shard_samples in pool.imap(_export_shard, tasks)
+                   for sample in shard_samples]
+    finally:
+        pool.close()
+        pool.join()
+
+    _write_index(directory, representation, bins, sample_duration, resolution,
+                 shard_sizes, samples)
+
+    return number_of_samples
+
+
+class DatasetExporter(CameraEventsHandler):
+    """Exports the live events stream to a directory of shards. The last
+    shard is preallocated as the others, and the index lists the samples
+    actually written to it. The packets left in the queue when the exporter
+    stops are exported, but the events of the incomplete last sample are
+    dropped.
+    """
+
+    def __init__(self, directory, representation='voxel', bins=5, sample_duration=50000,
+                 samples_per_shard=128, resolution=128, backend=PROCESS_BACKEND):
+        super(DatasetExporter, self).__init__(backend)
+
+        if representation not in REPRESENTATIONS:
+            raise ValueError('Unknown representation {0}'.format(representation))
+
+        self._directory = directory
+        self._representation = representation
+        self._bins = bins
+        self._sample_duration = sample_duration
+        self._samples_per_shard = samples_per_shard
+        self._resolution = resolution
+
+    def _open_shard(self):
+        shard_path = _get_shard_path(self._directory, len(self._shard_sizes))
+        _create_shard(shard_path, self._samples_per_shard, self._bins, self._resolution)
+
+        self._shard = np.load(shard_path, mmap_mode='r+')
+        self._shard_sizes.append(0)
+
+    def _write_sample(self):
+        events = np.concatenate(self._sample_events) if self._sample_events \
+                 else np.empty((0, 2), dtype=np.int64)
+        self._sample_events = []
+
+        if self._shard is None or self._shard_sizes[-1] == self._samples_per_shard:
+            self._open_shard()
+
+        row = self._shard_sizes[-1]
+        self._shard[row] = events_to_tensor(events, self._sample_start_time, self._sample_duration,
+                                            self._bins, self._representation, self._resolution)
+        self._shard_sizes[-1] += 1
+
+        self._samples.append([len(self._shard_sizes) - 1, row, self._sample_start_time,
+                              self._sample_start_time + self._sample_duration, len(events)])
+
+        self._sample_start_time += self._sample_duration
+
+    def _handle_events(self, events):
+        events = events_to_array(events)
+        if len(events) == 0:
+            return
+
+        unwrapped_events = np.empty(events.shape, dtype=np.int64)
+        unwrapped_events[:, 0] = events[:, 0]
+        unwrapped_events[:, 1] = self._timestamp_unwrapper.unwrap(events[:, 1])
+
+        if self._sample_start_time is None:
+            self._sample_start_time = int(unwrapped_events[0, 1])
+
+        # Write every sample which ends within this packet
+        while True:
+            sample_end_time = self._sample_start_time + self._sample_duration
+            split = np.searchsorted(unwrapped_events[:, 1], sample_end_time)
+            if split == len(unwrapped_events):
+                break
+
+            self._sample_events.append(unwrapped_events[:split])
+            unwrapped_events = unwrapped_events[split:]
+            self._write_sample()
+
+        self._sample_events.append(unwrapped_events)
+
+    def _init_handler(self):
+        # NOTE: The state is created in the context of the handler
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+        self._timestamp_unwrapper = TimestampUnwrapper()
+        self._shard = None
+        self._shard_sizes = []
+        self._samples = []
+        self._sample_events = []
+        self._sample_start_time = None
+
+    def _fini_handler(self):
+        try:
+            # Export the events left in the queue when stopped. The events
+            # of the incomplete last sample are dropped
+            self._drain_queue()
+        finally:
+            if self._shard is not None:
+                self._shard.flush()
+
+            _write_index(self._directory, self._representation, self._bins,
+                         self._sample_duration, self._resolution, self._shard_sizes,
+                         self._samples)
+
+if __name__ == '__main__':
+    import sys
+    from pycaer.process.demux import Demux
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'dataset'
+
+    exporter = DatasetExporter(directory)
+    demux = Demux([exporter.get_events_queue()])
+
+    exporter.start()
+    demux.start()
+
+    raw_input('Exporting to {0}. Press any key to stop...'.format(directory))
+
+    demux.stop()
+    exporter.stop()
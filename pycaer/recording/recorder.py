@@ -0,0 +1,176 @@
+""" Module for writing events recordings.
+
+The format of the recordings is described in the recording_format module.
+RecordingWriter writes events given to it directly, while EventsRecorder
+is an events handler which records the events sent by the Demux module.
+"""
+
+import numpy as np
+
+from .recording_format import VERSION, HEADER, HEADER_MAGIC, FOOTER, FOOTER_MAGIC, \
+                              EVENT_DTYPE, INDEX_DTYPE, DEFAULT_BLOCK_DURATION, \
+                              NUMBER_OF_TILES, get_tiles
+from ..process.camera_events_handler import CameraEventsHandler, PROCESS_BACKEND
+from ..dvs128.process_packets import events_to_array, unpack_polarity_events
+
+# Camera timestamps are positive 32-bit integers
+TIMESTAMP_WRAP = 2 ** 31
+
+
+class TimestampUnwrapper(object):
+    """Converts the wrapping 32-bit camera timestamps of consecutive
+    packets to 64-bit timestamps.
+    """
+
+    def __init__(self):
+        self._last_timestamp = None
+        self._timestamp_base = 0
+
+    def unwrap(self, timestamps):
+        timestamps = timestamps.astype(np.int64)
+
+        if self._last_timestamp is None:
+            self._last_timestamp = timestamps[0]
+
+        # NOTE: A large step backwards means the camera timestamp wrapped
+        steps = np.diff(np.concatenate(([self._last_timestamp], timestamps)))
+        wraps = np.cumsum(steps < -TIMESTAMP_WRAP // 2) * TIMESTAMP_WRAP
+
+        self._last_timestamp = timestamps[-1]
+
+        timestamps += self._timestamp_base + wraps
+        self._timestamp_base += wraps[-1]
+
+        return timestamps
+
+
+class RecordingWriter(object):
+    def __init__(self, path, block_duration=DEFAULT_BLOCK_DURATION):
+        self._file = open(path, 'wb')
+        self._block_duration = block_duration
+
+        self._file.write(HEADER.pack(HEADER_MAGIC, VERSION, block_duration))
+
+        self._index = []
+
+        # Events of the block currently being collected (not written yet)
+        self._block_slot = None
+        self._block_events = []
+
+        self._timestamp_unwrapper = TimestampUnwrapper()
+
+    def _flush_block(self):
+        if not self._block_events:
+            return
+
+        events = np.concatenate(self._block_events)
+        self._block_events = []
+
+        start_time = self._block_slot * self._block_duration
+        _, _, y, x = unpack_polarity_events(events)
+
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry['offset'] = self._file.tell()
+        entry['start_time'] = start_time
+        entry['end_time'] = events[-1, 1]
+        entry['number_of_events'] = len(events)
+        entry['x_min'] = x.min()
+        entry['y_min'] = y.min()
+        entry['x_max'] = x.max()
+        entry['y_max'] = y.max()
+
+        # NOTE: The sort is stable, so the events of each tile stay in time order
+        tiles = get_tiles(x, y)
+        order = np.argsort(tiles, kind='mergesort')
+        entry['tile_counts'] = np.bincount(tiles, minlength=NUMBER_OF_TILES)
+        self._index.append(entry)
+
+        block = np.empty(events.shape, dtype=EVENT_DTYPE)
+        block[:, 0] = events[order, 0]
+        block[:, 1] = events[order, 1] - start_time
+        self._file.write(block.tobytes())
+
+    def write(self, events):
+        """Write a packet of events (a list of (data, timestamp) tuples or
+        an (N, 2) array). Packets must be given in time order.
+        """
+
+        events = events_to_array(events)
+        if len(events) == 0:
+            return
+
+        timestamps = self._timestamp_unwrapper.unwrap(events[:, 1])
+
+        unwrapped_events = np.empty(events.shape, dtype=np.int64)
+        unwrapped_events[:, 0] = events[:, 0]
+        unwrapped_events[:, 1] = timestamps
+
+        # Split the packet at the boundaries of the blocks' time slots
+        slots = timestamps // self._block_duration
+        boundaries = np.flatnonzero(np.diff(slots)) + 1
+
+        for start, end in zip(np.concatenate(([0], boundaries)),
+                              np.concatenate((boundaries, [len(events)]))):
+            if slots[start] != self._block_slot:
+                self._flush_block()
+                self._block_slot = slots[start]
+
+            self._block_events.append(unwrapped_events[start:end])
+
+    def close(self):
+        if self._file.closed:
+            return
+
+        self._flush_block()
+
+        index_offset = self._file.tell()
+        if self._index:
+            self._file.write(np.concatenate(self._index).tobytes())
+
+        self._file.write(FOOTER.pack(index_offset, len(self._index), FOOTER_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class EventsRecorder(CameraEventsHandler):
+    def __init__(self, path, block_duration=DEFAULT_BLOCK_DURATION, backend=PROCESS_BACKEND):
+        super(EventsRecorder, self).__init__(backend)
+
+        self._path = path
+        self._block_duration = block_duration
+
+    def _handle_events(self, events):
+        self._writer.write(events)
+
+    def _init_handler(self):
+        # NOTE: The file is opened in the context of the handler
+        self._writer = RecordingWriter(self._path, self._block_duration)
+
+    def _fini_handler(self):
+        try:
+            # Record the events left in the queue when stopped
+            self._drain_queue()
+        finally:
+            self._writer.close()
+
+if __name__ == '__main__':
+    import sys
+    from pycaer.process.demux import Demux
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'recording.caer'
+
+    recorder = EventsRecorder(path)
+    demux = Demux([recorder.get_events_queue()])
+
+    recorder.start()
+    demux.start()
+
+    raw_input('Recording to {0}. Press any key to stop...'.format(path))
+
+    demux.stop()
+    recorder.stop()
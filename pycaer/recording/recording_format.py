@@ -0,0 +1,81 @@
+""" Module defining the file format of events recordings.
+
+A recording file is made of:
+1) A header holding the format version and the duration of the blocks.
+2) Blocks of events. Each block holds the events of a single time slot
+   of the block duration, as pairs of 32-bit integers (data, timestamp).
+   The timestamps are relative to the start time of the block. Within a
+   block, the events are grouped by tile (a square of TILE_SIZE pixels),
+   and each tile's events are in time order.
+3) The index. An entry per block holding its file offset, time range,
+   number of events, the bounding box of its events and the number of
+   events of each tile.
+4) A footer holding the offset of the index and the number of blocks.
+
+Timestamps in the index are 64-bit, in microseconds. The 32-bit camera
+timestamps wrap around (about every 35 minutes) and are unwrapped when
+recording so long recordings have a single time axis.
+
+The index allows readers to seek directly to a time range and skip
+blocks outside a region of interest without scanning the file. Since the
+events are grouped by tile, only the tiles of the region of interest are
+read from the blocks which are not skipped. A bounding box alone would
+skip almost nothing, as background noise spreads over the whole sensor
+within every block.
+"""
+
+import struct
+
+import numpy as np
+
+VERSION = 2
+
+HEADER = struct.Struct('<8sII')
+HEADER_MAGIC = b'PYCAERRC'
+
+FOOTER = struct.Struct('<QQ8s')
+FOOTER_MAGIC = b'PYCAERIX'
+
+EVENT_DTYPE = np.dtype('<i4')
+
+# Tiles are numbered column by column: tile_x * TILES_PER_ROW + tile_y
+TILE_SIZE = 16
+TILES_PER_ROW = 128 // TILE_SIZE
+NUMBER_OF_TILES = TILES_PER_ROW * TILES_PER_ROW
+
+INDEX_DTYPE = np.dtype([('offset', '<u8'),
+                        ('start_time', '<i8'), # Start of the block's time slot
+                        ('end_time', '<i8'),   # Timestamp of the block's last event
+                        ('number_of_events', '<u4'),
+                        # Bounding box of the events. Ends are inclusive
+                        ('x_min', 'u1'),
+                        ('y_min', 'u1'),
+                        ('x_max', 'u1'),
+                        ('y_max', 'u1'),
+                        # Number of events of each tile, in the order of the block
+                        ('tile_counts', '<u4', (NUMBER_OF_TILES,))])
+
+# Default block duration in microseconds
+DEFAULT_BLOCK_DURATION = 50000
+
+
+class RecordingFormatError(Exception):
+    pass
+
+
+def get_tiles(x, y):
+    """Get the tile of each pixel (x and y are arrays)."""
+
+    return (x // TILE_SIZE) * TILES_PER_ROW + y // TILE_SIZE
+
+def get_roi_tiles(roi):
+    """Get the sorted tiles which intersect an (x_start, y_start, x_end,
+    y_end) region of interest with exclusive ends.
+    """
+
+    x_start, y_start, x_end, y_end = roi
+
+    tiles_x = np.arange(max(x_start, 0) // TILE_SIZE, min(-(-x_end // TILE_SIZE), TILES_PER_ROW))
+    tiles_y = np.arange(max(y_start, 0) // TILE_SIZE, min(-(-y_end // TILE_SIZE), TILES_PER_ROW))
+
+    return (tiles_x[:, np.newaxis] * TILES_PER_ROW + tiles_y).ravel()
@@ -0,0 +1,170 @@
+""" Module for reading events recordings.
+
+Only the index of the recording is loaded when it is opened. Reading a
+time range seeks directly to the relevant blocks. With a region of
+interest, blocks with no events in its tiles are not read at all, and
+only the tiles of the region are read from the other blocks.
+
+Events are returned as (N, 2) int64 arrays of (data, timestamp) rows,
+with the unwrapped 64-bit timestamps of the recording.
+"""
+
+import numpy as np
+
+from .recording_format import VERSION, HEADER, HEADER_MAGIC, FOOTER, FOOTER_MAGIC, \
+                              EVENT_DTYPE, INDEX_DTYPE, RecordingFormatError, get_roi_tiles
+from ..dvs128.process_packets import unpack_polarity_events
+
+
+class RecordingReader(object):
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+
+        magic, version, self._block_duration = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != HEADER_MAGIC or version != VERSION:
+            raise RecordingFormatError('{0} is not a supported recording'.format(path))
+
+        self._file.seek(-FOOTER.size, 2)
+        index_offset, number_of_blocks, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+        if magic != FOOTER_MAGIC:
+            raise RecordingFormatError('{0} was not closed properly'.format(path))
+
+        self._file.seek(index_offset)
+        self._index = np.fromfile(self._file, dtype=INDEX_DTYPE, count=number_of_blocks)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_block_duration(self):
+        return self._block_duration
+
+    def get_index(self):
+        return self._index
+
+    def get_start_time(self):
+        """Timestamp of the first event, or None for an empty recording."""
+
+        if len(self._index) == 0:
+            return None
+
+        # NOTE: The index holds the start of the first block's time
+        # slot rather than the first event itself
+        return self._read_block(0)[0, 1]
+
+    def get_end_time(self):
+        """Timestamp following the last event, or None for an empty recording."""
+
+        if len(self._index) == 0:
+            return None
+
+        return self._index['end_time'][-1] + 1
+
+    def get_number_of_events(self):
+        return int(self._index['number_of_events'].sum())
+
+    def _read_block(self, block, tiles=None):
+        """Read the events of a block in time order. "tiles" is an optional
+        sorted array of the only tiles to read.
+        """
+
+        entry = self._index[block]
+        tile_counts = entry['tile_counts'].astype(np.int64)
+        tile_offsets = np.concatenate(([0], np.cumsum(tile_counts)))
+
+        if tiles is None:
+            tiles = np.arange(len(tile_counts))
+
+        # Consecutive tiles are contiguous in the block, so they are
+        # read in a single run
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(tiles) != 1) + 1))
+        run_ends = np.concatenate((run_starts[1:], [len(tiles)]))
+
+        parts = []
+        for run_start, run_end in zip(run_starts, run_ends):
+            start = tile_offsets[tiles[run_start]]
+            count = tile_offsets[tiles[run_end - 1] + 1] - start
+            if count == 0:
+                continue
+
+            self._file.seek(int(entry['offset']) + start * 2 * EVENT_DTYPE.itemsize)
+            parts.append(np.fromfile(self._file, dtype=EVENT_DTYPE, count=2 * int(count)))
+
+        if not parts:
+            return np.empty((0, 2), dtype=np.int64)
+
+        events = np.concatenate(parts).reshape(-1, 2).astype(np.int64)
+        # NOTE: The events of each tile are already in time order. The sort
+        # is stable so events of the same timestamp keep their tile order
+        events = events[np.argsort(events[:, 1], kind='mergesort')]
+        events[:, 1] += entry['start_time']
+
+        return events
+
+    def _find_blocks(self, start_time, end_time, roi_tiles):
+        index = self._index
+
+        # Blocks are sorted by time and their time slots do not overlap
+        first = np.searchsorted(index['end_time'], start_time, side='left')
+        last = np.searchsorted(index['start_time'], end_time, side='left')
+        blocks = np.arange(first, last)
+
+        if roi_tiles is not None:
+            occupied = index['tile_counts'][first:last][:, roi_tiles].sum(axis=1) > 0
+            blocks = blocks[occupied]
+
+        return blocks
+
+    def read(self, start_time, end_time, roi=None):
+        """Read the events of the time range [start_time, end_time).
+
+        "roi" is an optional (x_start, y_start, x_end, y_end) region of
+        interest with exclusive ends.
+        """
+
+        roi_tiles = get_roi_tiles(roi) if roi is not None else None
+
+        blocks = self._find_blocks(start_time, end_time, roi_tiles)
+        if len(blocks) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        events = np.concatenate([self._read_block(block, roi_tiles) for block in blocks])
+
+        # Only the first and last blocks may hold events outside the range
+        selected = (events[:, 1] >= start_time) & (events[:, 1] < end_time)
+
+        if roi is not None:
+            x_start, y_start, x_end, y_end = roi
+            _, _, y, x = unpack_polarity_events(events)
+            selected &= (x >= x_start) & (x < x_end) & (y >= y_start) & (y < y_end)
+
+        return events[selected]
+
+    def iter_packets(self, start_time=None, end_time=None, packet_duration=None, roi=None):
+        """Yield the events of the time range in consecutive packets.
+
+        Packets span "packet_duration" microseconds (by default, the
+        block duration). The range defaults to the entire recording.
+        """
+
+        if len(self._index) == 0:
+            return
+
+        if start_time is None:
+            start_time = self._index['start_time'][0]
+        if end_time is None:
+            end_time = self.get_end_time()
+        if packet_duration is None:
+            packet_duration = self._block_duration
+
+        for packet_start_time in xrange(int(start_time), int(end_time), int(packet_duration)):
+            events = self.read(packet_start_time,
+                               min(packet_start_time + packet_duration, end_time),
+                               roi)
+            if len(events) > 0:
+                yield events